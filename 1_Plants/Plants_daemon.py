@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: Plants_daemon.py
+%   Description: Long-running e-paper frame server
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import json
+import socket
+import asyncio
+import argparse
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from labelmaker import trace
+from labelmaker.sprites import SpriteAtlas
+import Plants_epaper
+
+SOCKET = '/tmp/labelmaker.sock'
+
+
+class RenderService(object):
+    """Renders e-paper frames, keeping templates, icons and gauges warm.
+
+    Every (template, page) keeps its EpaperRenderer, so a request only
+    draws the live readings over the cached static layer. A renderer is
+    rebuilt when its template file changes. Templates must live under
+    root_dir.
+    """
+
+    def __init__(self, root_dir='examples', sprites=True):
+        self.root_dir = os.path.realpath(root_dir)
+        self.atlas = SpriteAtlas() if sprites else None
+        self.renderers = {}
+        Plants_epaper.warm_up()
+
+    def template(self, path):
+        path = os.path.realpath(os.path.join(self.root_dir, path))
+        if os.path.commonpath([path, self.root_dir]) != self.root_dir:
+            raise ValueError('Template outside of ' + self.root_dir)
+        return path
+
+    def renderer(self, path, page=1):
+        path = self.template(path)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.renderers.get((path, page))
+        if cached is None or cached[0] != mtime:
+            with trace.stage('parse'):
+                renderer = Plants_epaper.EpaperRenderer.from_file(path, page, self.atlas)
+            cached = self.renderers[(path, page)] = mtime, renderer
+        return cached[1]
+
+    def frame(self, request):
+        """Return (header, payload) of a frame request.
+
+        A request is a dict with 'template' (relative to root_dir) and
+        optionally 'page', 'values', 'date', 'battery', 'format' ('png',
+        '1bpp' or '2bpp') and 'dither'.
+        """
+        fmt = request.get('format', 'png')
+        if fmt not in Plants_epaper.FORMATS:
+            raise ValueError('Unknown format ' + str(fmt))
+        renderer = self.renderer(request['template'], request.get('page', 1))
+        with trace.label(request['template']):
+            surface = renderer.update(request.get('values'), request.get('date'),
+                                      request.get('battery'))
+            with trace.stage('encode'):
+                payload = Plants_epaper.encode(surface, fmt, request.get('dither'))
+        header = {'ok': True, 'format': fmt, 'width': renderer.size[0],
+                  'height': renderer.size[1], 'length': len(payload)}
+        return header, payload
+
+    async def handle(self, reader, writer):
+        """Serve a connection: one JSON request per line, each answered by a
+        JSON header line and 'length' bytes of frame."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    header, payload = self.frame(json.loads(line))
+                except Exception as e:
+                    header, payload = {'ok': False, 'error': '%s: %s' % (type(e).__name__, e),
+                                       'length': 0}, b''
+                writer.write(json.dumps(header).encode() + b'\n' + payload)
+                await writer.drain()
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(service, path=SOCKET, port=None):
+    """Serve frames on a Unix socket, or on localhost:port."""
+    if port is not None:
+        server = await asyncio.start_server(service.handle, '127.0.0.1', port)
+    else:
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(service.handle, path)
+    async with server:
+        await server.serve_forever()
+
+
+def request(address=SOCKET, **fields):
+    """Client side: ask a running daemon for a frame, returning (header, payload).
+
+    address is the socket path or a localhost port number.
+    """
+    if isinstance(address, int):
+        connection = socket.create_connection(('127.0.0.1', address))
+    else:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(address)
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps(fields).encode() + b'\n')
+        stream.flush()
+        header = json.loads(stream.readline())
+        payload = stream.read(header['length'])
+    return header, payload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve e-paper frames from warm templates.')
+    parser.add_argument('root_dir', nargs='?', default='examples')
+    parser.add_argument('--socket', default=SOCKET, help='Unix socket path')
+    parser.add_argument('--port', type=int, default=None,
+                        help='listen on localhost:PORT instead of a Unix socket')
+    parser.add_argument('--no-sprites', action='store_true',
+                        help='draw gauges instead of blitting them from a sprite atlas')
+    args = parser.parse_args()
+
+    service = RenderService(args.root_dir, sprites=not args.no_sprites)
+    try:
+        asyncio.run(serve(service, args.socket, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -11,52 +11,80 @@
 ------------------------------------------------------------
 """
 import os
+import io
+import time
 import fnmatch
+import argparse
+import multiprocessing
 import datetime
-import numpy as np
 import math
 import cairo
-import json
-
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from labelmaker import assets, framebuffer, quality, template, text, trace, watch
+from labelmaker.manifest import Manifest
+from labelmaker.bundle import Bundle, Collector
+from labelmaker.output import PngWriter, save_bytes, save_png
+from labelmaker.sprites import SpriteAtlas
+from labelmaker.variants import VariantStore
+
+RENDERER_VERSION = 1
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '0_Resources')
+BATTERY_STEPS = (10, 20, 30, 50, 60, 70, 80, 90)
+GAUGES = ('moisture', 'temperature', 'light', 'humidity')
+SIMULATED = {'moisture': 50, 'temperature': 18, 'light': 200, 'humidity': 200}
+SIMULATED_BATTERY = 85
+FORMATS = {'png': None, '1bpp': 1, '2bpp': 2}
+
+@trace.timed('image')
 def draw_image(ctx, image, top, left, height, width, rot=0):
     """Draw a scaled image on a given context."""
-    image_surface = cairo.ImageSurface.create_from_png(image)
     # calculate proportional scaling
-    img_height = image_surface.get_height()
-    img_width = image_surface.get_width()
+    img_width, img_height = assets.dimensions(image)
     width_ratio = float(width) / float(img_width)
     height_ratio = float(height) / float(img_height)
     scale_xy = min(height_ratio, width_ratio)
+    if assets.cache.prescale:
+        image_surface = assets.load_scaled(image, img_width*scale_xy, img_height*scale_xy)
+        scale_xy = 1
+    else:
+        image_surface = assets.load(image)
     # scale image and add it
     ctx.save()
     ctx.rotate(rot*math.pi/180)
     ctx.translate(left, top)
     ctx.scale(scale_xy, scale_xy)
     ctx.set_source_surface(image_surface)
+    quality.filter_images(ctx)
 
     ctx.paint()
     ctx.restore()
 
-def plot_parameter(ctx, parameter, value=False, thick=5, angle=270):
-    alpha = np.deg2rad(angle)
-    beta = 2*math.pi - alpha
-
-    rel_range = parameter['rel_range']
-    abs_range = parameter['abs_range']
-    left = parameter['position'][0]
-    top = parameter['position'][1]
-    radius = parameter['radius']
-
-    if rel_range[0] < abs_range[0] or rel_range[1] > abs_range[1]:
-        print('Error: rel_range values are not in abs_range')
+def gauge_box(gauge, thick=5):
+    """Box (left, top, width, height) a gauge and its needle are drawn in."""
+    margin = thick + 2
+    size = 2*(gauge.radius + margin)
+    return gauge.left - margin, gauge.top - margin, size, size
+
+@trace.timed('gauge')
+def plot_gauge(ctx, gauge, thick=5, atlas=None):
+    """Draw the static part of a gauge: icon, range arcs and contour."""
+    if atlas is not None:
+        key = ('gauge', assets.AssetCache.key(gauge.icon), gauge.rel_range, gauge.abs_range,
+               gauge.radius, thick, gauge.angle)
+        atlas.draw(ctx, key, *gauge_box(gauge, thick),
+                   render=lambda sprite_ctx: plot_gauge(sprite_ctx, gauge, thick))
         return
 
-    min_beta = (rel_range[0]-abs_range[0])/np.abs(abs_range[1]-abs_range[0])*alpha
-    max_beta = (1 - (abs_range[1]-rel_range[1])/np.abs(abs_range[1]-abs_range[0])) *alpha
+    beta = gauge.beta
+    left = gauge.left
+    top = gauge.top
+    radius = gauge.radius
 
     """ Icon """
     size = radius
-    draw_image(ctx, parameter['icon'],
+    draw_image(ctx, gauge.icon,
                top+radius-size/2,
                left+radius-size/2,
                size,
@@ -66,12 +94,12 @@ def plot_parameter(ctx, parameter, value=False, thick=5, angle=270):
     ctx.set_line_width(thick)
     ctx.set_source_rgb(1, 0, 0)
     ctx.move_to(left+radius+(radius-thick/2)*math.cos(math.pi/2+beta/2), top+radius+(radius-thick/2)*math.sin(math.pi/2+beta/2))
-    ctx.arc(left+radius, top+radius, radius-thick/2, math.pi/2+beta/2, math.pi/2+beta/2+min_beta)
+    ctx.arc(left+radius, top+radius, radius-thick/2, math.pi/2+beta/2, math.pi/2+beta/2+gauge.min_beta)
     ctx.stroke()
 
     """ Maximum """
-    ctx.move_to(left+radius+(radius-thick/2)*math.cos(math.pi/2+beta/2+max_beta), top+radius+(radius-thick/2)*math.sin(math.pi/2+beta/2+max_beta))
-    ctx.arc(left+radius, top+radius, radius-thick/2, math.pi/2+beta/2+max_beta, math.pi/2-beta/2)
+    ctx.move_to(left+radius+(radius-thick/2)*math.cos(math.pi/2+beta/2+gauge.max_beta), top+radius+(radius-thick/2)*math.sin(math.pi/2+beta/2+gauge.max_beta))
+    ctx.arc(left+radius, top+radius, radius-thick/2, math.pi/2+beta/2+gauge.max_beta, math.pi/2-beta/2)
     ctx.stroke()
 
     """ Contour """
@@ -84,154 +112,546 @@ def plot_parameter(ctx, parameter, value=False, thick=5, angle=270):
     ctx.line_to(left+radius+radius*math.cos(math.pi/2-beta/2), top+radius+radius*math.sin(math.pi/2-beta/2))
     ctx.stroke()
 
-    """ Value indicator """
-    if value:
-        val = (value - abs_range[0]) / np.abs(abs_range[1] - abs_range[0]) * alpha
-
-        ctx.move_to(left + radius + radius * math.cos(math.pi / 2 + beta / 2 + val),
-                    top + radius + radius * math.sin(math.pi / 2 + beta / 2 + val))
-        ctx.line_to(left + radius + (radius+thick) * math.cos(math.pi / 2 + beta / 2 + val + 0.1),
-                top + radius + (radius+thick) * math.sin(math.pi / 2 + beta / 2 + val + 0.1))
-        ctx.line_to(left + radius + (radius+thick) * math.cos(math.pi / 2 + beta / 2 + val - 0.1),
-                top + radius + (radius+thick) * math.sin(math.pi / 2 + beta / 2 + val - 0.1))
-        ctx.line_to(left + radius + (radius) * math.cos(math.pi / 2 + beta / 2 + val),
-                top + radius + (radius) * math.sin(math.pi / 2 + beta / 2 + val))
-        ctx.fill_preserve()
-        ctx.stroke()
-
-        label = str(value) + ' ' + parameter['unit']
-        xbearing, ybearing, width, height, dx, dy = ctx.text_extents(label)
-        ctx.set_source_rgb(0, 0, 0)
-        ctx.set_font_size(parameter['font_size'])
-        ctx.select_font_face(parameter['font_type'],
-                             cairo.FONT_SLANT_NORMAL,
-                             cairo.FONT_WEIGHT_NORMAL)
-        ctx.move_to(left + radius + parameter['font_xoff']- width/2, top +2.7*radius)
-        ctx.show_text(label)
+def draw_needle(ctx, left, top, radius, thick, beta, val):
+    ctx.set_line_width(1)
+    ctx.set_source_rgb(0, 0, 0)
+    ctx.move_to(left + radius + radius * math.cos(math.pi / 2 + beta / 2 + val),
+                top + radius + radius * math.sin(math.pi / 2 + beta / 2 + val))
+    ctx.line_to(left + radius + (radius+thick) * math.cos(math.pi / 2 + beta / 2 + val + 0.1),
+            top + radius + (radius+thick) * math.sin(math.pi / 2 + beta / 2 + val + 0.1))
+    ctx.line_to(left + radius + (radius+thick) * math.cos(math.pi / 2 + beta / 2 + val - 0.1),
+            top + radius + (radius+thick) * math.sin(math.pi / 2 + beta / 2 + val - 0.1))
+    ctx.line_to(left + radius + (radius) * math.cos(math.pi / 2 + beta / 2 + val),
+            top + radius + (radius) * math.sin(math.pi / 2 + beta / 2 + val))
+    ctx.fill_preserve()
+    ctx.stroke()
 
+@trace.timed('gauge_value')
+def plot_value(ctx, gauge, value, thick=5, atlas=None):
+    """Draw the value indicator and the value label of a gauge.
 
-def main(path, simulation=False, page=1):
-    with open(path) as json_file:
-        config = json.load(json_file)
+    With an atlas the indicator is a sprite, its angle quantized to one
+    pixel of arc length.
+    """
+    beta = gauge.beta
+    left = gauge.left
+    top = gauge.top
+    radius = gauge.radius
 
-    surface = cairo.ImageSurface(cairo.FORMAT_RGB24,
-                                 config['general']['size'][0],
-                                 config['general']['size'][1])
-    ctx = cairo.Context(surface)
-    ctx.scale(1, 1)
+    """ Value indicator """
+    val = gauge.beta_of(value)
+    if atlas is not None:
+        step = int(round(val * radius))
+        atlas.draw(ctx, ('needle', radius, thick, gauge.angle, step), *gauge_box(gauge, thick),
+                   render=lambda sprite_ctx: draw_needle(sprite_ctx, left, top, radius, thick,
+                                                         beta, step / radius))
+    else:
+        draw_needle(ctx, left, top, radius, thick, beta, val)
+
+    label = str(value) + ' ' + gauge.unit
+    xbearing, ybearing, width, height, dx, dy = text.extents(gauge.font_type,
+                                                             gauge.font_size, label)
+    ctx.set_source_rgb(0, 0, 0)
+    ctx.set_font_size(gauge.font_size)
+    ctx.select_font_face(gauge.font_type,
+                         cairo.FONT_SLANT_NORMAL,
+                         cairo.FONT_WEIGHT_NORMAL)
+    ctx.move_to(left + radius + gauge.font_xoff- width/2, top +2.7*radius)
+    ctx.show_text(label)
 
-    ctx.rectangle(0, 0, config['general']['size'][0], config['general']['size'][1])
-    ctx.set_source_rgb(config['general']['background'][0], config['general']['background'][1], config['general']['background'][2])
+def plot_parameter(ctx, gauge, value=False, thick=5, atlas=None):
+    plot_gauge(ctx, gauge, thick, atlas)
+    if value:
+        plot_value(ctx, gauge, value, thick, atlas)
+
+def battery_icon(level):
+    """Battery icon of the smallest charge step covering the level."""
+    for step in BATTERY_STEPS:
+        if level <= step:
+            return os.path.join(RESOURCES, 'Battery', 'battery-' + str(step) + '.png')
+    return os.path.join(RESOURCES, 'Battery', 'battery.png')
+
+def draw_static(ctx, template, page=1, atlas=None):
+    """Draw everything of a page that does not depend on live readings."""
+    ctx.rectangle(0, 0, template.width, template.height)
+    ctx.set_source_rgb(*template.background)
     ctx.fill()
 
     """ Title """
+    title = template.title
     ctx.set_source_rgb(0, 0, 0)
-    ctx.set_font_size(config['title']['font_size'])
-    ctx.select_font_face(config['title']['font_type'],
+    ctx.set_font_size(title.font_size)
+    ctx.select_font_face(title.font_type,
                          cairo.FONT_SLANT_NORMAL,
                          cairo.FONT_WEIGHT_NORMAL)
-    ctx.move_to(config['title']['position'][0], config['title']['position'][1])
-    ctx.show_text(config['title']['value'])
+    ctx.move_to(title.left, title.top)
+    ctx.show_text(title.value)
 
     """ Subtitle """
-    ctx.set_font_size(config['subtitle']['font_size'])
-    ctx.select_font_face(config['subtitle']['font_type'],
+    subtitle = template.subtitle
+    ctx.set_font_size(subtitle.font_size)
+    ctx.select_font_face(subtitle.font_type,
                          cairo.FONT_SLANT_ITALIC,
                          cairo.FONT_WEIGHT_NORMAL)
-    ctx.move_to(config['subtitle']['position'][0], config['subtitle']['position'][1])
-    ctx.show_text(config['subtitle']['value'])
+    ctx.move_to(subtitle.left, subtitle.top)
+    ctx.show_text(subtitle.value)
 
     """ Life-cycle"""
-    if config['life-cycle']['display']:
-        lifespan = config['life-cycle']['span']
-        xbearing, ybearing, width, height, dx, dy = ctx.text_extents(lifespan)
-
-        ctx.set_font_size(config['subtitle']['font_size'])
-        ctx.select_font_face(config['subtitle']['font_type'],
+    if template.life_cycle.display:
+        lifespan = template.life_cycle.span
+        xbearing, ybearing, width, height, dx, dy = text.extents(subtitle.font_type,
+                                                                 subtitle.font_size,
+                                                                 lifespan)
+
+        ctx.set_font_size(subtitle.font_size)
+        ctx.select_font_face(subtitle.font_type,
                              cairo.FONT_SLANT_NORMAL,
                              cairo.FONT_WEIGHT_NORMAL)
-        ctx.move_to(config['general']['size'][0] - 1.1*width, config['title']['position'][1])
+        ctx.move_to(template.width - 1.1*width, title.top)
         ctx.show_text(lifespan)
 
-        draw_image(ctx, config['life-cycle']['icon'],
-                   config['title']['position'][0],
-                   config['general']['size'][0] - 1.2*width - height,
+        draw_image(ctx, template.life_cycle.icon,
+                   title.left,
+                   template.width - 1.2*width - height,
                    1.2*height,
                    1.2*height)
 
-    """ Life-cycle"""
-    if config['synchronized']['display']:
-        draw_image(ctx, config['synchronized']['icon'],
-                   config['synchronized']['position'][0],
-                   config['synchronized']['position'][1],
-                   config['synchronized']['position'][2],
-                   config['synchronized']['position'][3])
+    """ Synchronized"""
+    synchronized = template.synchronized
+    if synchronized.display:
+        draw_image(ctx, synchronized.path,
+                   synchronized.top,
+                   synchronized.left,
+                   synchronized.height,
+                   synchronized.width)
 
     """ Image """
-    draw_image(ctx, config['image']['path'],
-               config['image']['position'][1],
-               config['image']['position'][0],
-               config['image']['size'][0],
-               config['image']['size'][1])
-
+    image = template.image
+    draw_image(ctx, image.path, image.top, image.left, image.height, image.width)
 
     """ Parameters """
-    sim = 1
-    if not simulation:
-        sim = 0
-
     if page == 1:
-        plot_parameter(ctx, config['parameters']['moisture'], sim*50)
-        plot_parameter(ctx, config['parameters']['temperature'], sim*18)
-        plot_parameter(ctx, config['parameters']['light'], sim*200)
-        plot_parameter(ctx, config['parameters']['humidity'], sim*200)
-        # plot_parameter(ctx, config['parameters']['fertility'], sim*440)
+        for name in GAUGES:
+            plot_gauge(ctx, template.gauge(name), atlas=atlas)
     if page == 2:
-        draw_image(ctx, config['bubble']['path'],
-                   config['bubble']['position'][1],
-                   config['bubble']['position'][0],
-                   config['bubble']['size'][0],
-                   config['bubble']['size'][1])
-    """ Simulated data """
-    if simulation:
-        """ Date """
-
-        today = datetime.date.today()
-        date = today.strftime("%d/%m")
-        xbearing, ybearing, width, height, dx, dy = ctx.text_extents(date)
-        ctx.set_font_size(config['subtitle']['font_size'])
-        ctx.select_font_face(config['subtitle']['font_type'],
+        bubble = template.bubble
+        draw_image(ctx, bubble.path, bubble.top, bubble.left, bubble.height, bubble.width)
+
+def draw_dynamic(ctx, template, page=1, values=None, date=None, battery=None, atlas=None):
+    """Draw the live readings, date and battery status of a page."""
+    if page == 1 and values:
+        for name in GAUGES:
+            if values.get(name):
+                plot_value(ctx, template.gauge(name), values[name], atlas=atlas)
+
+    subtitle = template.subtitle
+
+    """ Date """
+    if date is not None:
+        if isinstance(date, datetime.date):
+            date = date.strftime("%d/%m")
+        ctx.set_font_size(subtitle.font_size)
+        ctx.select_font_face(subtitle.font_type,
                              cairo.FONT_SLANT_NORMAL,
                              cairo.FONT_WEIGHT_NORMAL)
-        ctx.move_to(config['general']['size'][0] - (1.1*width), config['subtitle']['position'][1])
+        xbearing, ybearing, width, height, dx, dy = text.extents(subtitle.font_type,
+                                                                 subtitle.font_size,
+                                                                 date)
+        ctx.move_to(template.width - (1.1*width), subtitle.top)
         ctx.show_text(date)
 
-
-        """ Battery status"""
-        bat = str(85) + "%"
-
-        xbearing, ybearing, width, height, dx, dy = ctx.text_extents(bat)
-        ctx.set_font_size(config['subtitle']['font_size'])
-        ctx.select_font_face(config['subtitle']['font_type'],
+    """ Battery status"""
+    if battery is not None:
+        bat = str(battery) + "%"
+        ctx.set_font_size(subtitle.font_size)
+        ctx.select_font_face(subtitle.font_type,
                              cairo.FONT_SLANT_NORMAL,
                              cairo.FONT_WEIGHT_NORMAL)
-        ctx.move_to(config['general']['size'][0] - width - 25, config['title']['position'][1])
+        xbearing, ybearing, width, height, dx, dy = text.extents(subtitle.font_type,
+                                                                 subtitle.font_size,
+                                                                 bat)
+        ctx.move_to(template.width - width - 25, template.title.top)
         ctx.show_text(bat)
-        draw_image(ctx, '../0_Resources/Battery/battery-90.png',
-                   5-config['general']['size'][0],
+        draw_image(ctx, battery_icon(battery),
+                   5-template.width,
                    5, 20, 20, 90)
-    output = path.split('.')[0] + '_label_page_' + str(page) + '.png'
-    surface.write_to_png(output)
 
-if __name__ == "__main__":
-    root_dir = 'examples'
+def displayed(page=1, values=None, date=None, battery=None):
+    """(values, date, battery) as a page shows them.
+
+    Readings are rounded to whole numbers and only kept when page 1 draws
+    them; the date becomes its day/month text. Inputs that give the same
+    result draw the same frame.
+    """
+    shown = {}
+    if page == 1 and values:
+        for name in GAUGES:
+            value = int(round(values.get(name) or 0))
+            if value:
+                shown[name] = value
+    if isinstance(date, datetime.date):
+        date = date.strftime("%d/%m")
+    if battery is not None:
+        battery = int(round(battery))
+    return shown, date, battery
+
+class EpaperRenderer(object):
+    """Renderer of one template page that caches its static layer.
+
+    The background, texts, images and gauge contours are drawn once;
+    update() only paints the live readings over a copy of that base.
+    Gauges are blitted from a SpriteAtlas when one is given.
+    """
+
+    def __init__(self, model, page=1, atlas=None):
+        self.model = model
+        self.page = page
+        self.atlas = atlas
+        self.size = quality.size(model.width, model.height)
+        self.base = cairo.ImageSurface(cairo.FORMAT_RGB24, *self.size)
+        ctx = cairo.Context(self.base)
+        quality.setup(ctx)
+        draw_static(ctx, model, page, atlas)
+        self.base.flush()
+
+    @classmethod
+    def from_file(cls, path, page=1, atlas=None):
+        return cls(template.load(path, gauges=GAUGES), page, atlas)
+
+    def update(self, values=None, date=None, battery=None):
+        """Return a new frame with the readings drawn on the cached base."""
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, *self.size)
+        ctx = cairo.Context(surface)
+        ctx.set_source_surface(self.base, 0, 0)
+        ctx.paint()
+        quality.setup(ctx)
+        draw_dynamic(ctx, self.model, self.page, values, date, battery, self.atlas)
+        return surface
+
+    def partial(self, tracker, device, values=None, date=None, battery=None):
+        """Render a frame and return only the regions that changed for a device.
+
+        The regions are (x, y, w, h, pixels) tuples from a
+        labelmaker.partial.FrameTracker; the first frame is sent whole.
+        """
+        return tracker.refresh(device, self.update(values, date, battery))
+
+def encode(surface, fmt='png', dither=None):
+    """Bytes of a frame: a PNG file or a packed panel framebuffer."""
+    if fmt == 'png':
+        buffer = io.BytesIO()
+        surface.write_to_png(buffer)
+        return buffer.getvalue()
+    return framebuffer.to_bytes(surface, FORMATS[fmt], dither)
+
+def output_path(path, page, fmt='png'):
+    extension = '.png' if fmt == 'png' else '.bin'
+    return path.split('.')[0] + '_label_page_' + str(page) + quality.suffix() + extension
+
+def assets_of(model, simulation=False, page=1):
+    """Asset files a template page is drawn from."""
+    files = [model.image.path]
+    if model.life_cycle.display:
+        files.append(model.life_cycle.icon)
+    if model.synchronized.display:
+        files.append(model.synchronized.path)
+    if page == 1:
+        files += [model.gauge(name).icon for name in GAUGES]
+    if page == 2:
+        files.append(model.bubble.path)
+    if simulation:
+        files.append(battery_icon(SIMULATED_BATTERY))
+    return files
+
+def main(path, simulation=False, page=1, manifest=None, fmt='png', dither=None, atlas=None,
+         writer=None, model=None):
+    """Render one page of a template.
+
+    fmt is 'png', or '1bpp'/'2bpp' to write the packed panel framebuffer
+    (optionally dithered) instead of a PNG. With a PngWriter, PNGs are
+    encoded and written in the background. model is the compiled
+    template of path, when it is already loaded.
+    """
+    if model is None:
+        with trace.stage('parse'):
+            model = template.load(path, gauges=GAUGES)
+
+    output = output_path(path, page, fmt)
+    if manifest is not None:
+        section = {'config': model.source, 'page': page, 'simulation': simulation,
+                   'fmt': fmt, 'dither': dither, 'sprites': atlas is not None}
+        if simulation:
+            section['date'] = datetime.date.today().isoformat()
+        if assets.cache.variants is not None:
+            section['threshold'] = assets.cache.variants.threshold
+        if quality.current.draft:
+            section['draft'] = quality.current.draft
+        key = manifest.key(RENDERER_VERSION, section, assets_of(model, simulation, page))
+        if manifest.fresh(output, key):
+            return False
+
+    with trace.label(output):
+        renderer = EpaperRenderer(model, page, atlas)
+
+        """ Simulated data """
+        if simulation:
+            surface = renderer.update(SIMULATED, datetime.date.today(), SIMULATED_BATTERY)
+        else:
+            surface = renderer.update()
+
+        if fmt == 'png':
+            save_png(surface, output, writer)
+        else:
+            save_bytes(framebuffer.to_bytes(surface, FORMATS[fmt], dither), output, writer)
+    if manifest is not None:
+        manifest.record(output, key)
+    return True
+
+def find_templates(root_dir='examples'):
     json_files = []
     for path, dirs, files in os.walk(root_dir):
         for file in fnmatch.filter(files, '*.json'):
             json_files.append(os.path.join(path, file))
-
+    return sorted(json_files)
+
+def warm_up(resources_dir=RESOURCES):
+    """Decode the shared icons into this process' asset cache."""
+    for path, dirs, files in os.walk(resources_dir):
+        if os.path.basename(path) == 'spices':
+            continue
+        for file in fnmatch.filter(files, '*.png'):
+            assets.load(os.path.join(path, file))
+
+worker_manifest = None
+worker_atlas = None
+worker_writer = None
+
+def init_worker(manifest=None, sprites=False, tracing=False, writer=None, variants=None,
+                draft=None):
+    """Pool initializer: keep a manifest copy and warm the asset cache."""
+    global worker_manifest, worker_atlas, worker_writer
+    trace.enable(tracing)
+    worker_manifest = manifest
+    worker_atlas = SpriteAtlas() if sprites else None
+    worker_writer = writer
+    assets.use_variants(variants)
+    quality.use_draft(draft)
+    warm_up()
+
+def render_job(job):
+    """Render one (template, page) job, reporting the error instead of raising.
+
+    Returns (path, page, rendered, error, manifest entry, trace records,
+    outputs held for a bundle, new variant index entries).
+    """
+    path, page, simulation, fmt, dither, model = job
+    rendered, error, entry = False, None, None
+    try:
+        rendered = main(path, simulation=simulation, page=page, manifest=worker_manifest,
+                        fmt=fmt, dither=dither, atlas=worker_atlas, writer=worker_writer,
+                        model=model)
+    except Exception as e:
+        error = '%s: %s' % (type(e).__name__, e)
+    if rendered and worker_manifest is not None:
+        output = output_path(path, page, fmt)
+        entry = output, worker_manifest.entries[output]
+    records = trace.tracer.drain() if trace.tracer.enabled else None
+    files = worker_writer.drain() if isinstance(worker_writer, Collector) else None
+    indexed = assets.cache.variants.drain() if assets.cache.variants is not None else None
+    return path, page, rendered, error, entry, records, files, indexed
+
+def batch(json_files, pages=(1, 2), simulation=False, processes=None, manifest=None,
+          fmt='png', dither=None, sprites=False, writer=None, variants=None, bundle=None,
+          draft=None):
+    """Render every template page over a pool of worker processes.
+
+    Each worker warms its asset cache once and keeps it for all of its
+    jobs. With a manifest, pages whose inputs are unchanged are skipped
+    and the new entries are recorded in it. When tracing is enabled the
+    workers' stage timings are collected into this process' tracer.
+    A PngWriter is only used when rendering in-process (processes=1);
+    the caller flushes it. Images are drawn from the pre-scaled variants
+    of a VariantStore, when given; the index entries the workers add are
+    merged into it, for the caller to save. Every template is validated
+    before the first job starts. With a Bundle every output goes into it instead of
+    its own file, the workers handing theirs back to this process. draft
+    renders reduced-scale previews at that scale instead of final pages.
+    Returns the failed jobs as (path, page, error) tuples.
+    """
+    jobs, failed = [], []
     for path in json_files:
-        print('Generating path ' + path)
-        main(path, simulation=False, page=1)
-        main(path, simulation=False, page=2)
+        try:
+            with trace.stage('parse'):
+                model = template.load(path, gauges=GAUGES)
+        except (OSError, ValueError) as e:
+            error = '%s: %s' % (type(e).__name__, e)
+            print('Error: ' + error)
+            failed += [(path, page, error) for page in pages]
+            continue
+        jobs += [(path, page, simulation, fmt, dither, model) for page in pages]
+    if processes == 1:
+        init_worker(manifest, sprites, trace.tracer.enabled, bundle or writer, variants, draft)
+        results = map(render_job, jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, initializer=init_worker,
+                                    initargs=(manifest, sprites, trace.tracer.enabled,
+                                              Collector(bundle.level) if bundle else None,
+                                              variants, draft))
+        results = pool.imap_unordered(render_job, jobs)
+    try:
+        for path, page, rendered, error, entry, records, files, indexed in results:
+            if error is not None:
+                print('Error: ' + path + ' page ' + str(page) + ': ' + error)
+                failed.append((path, page, error))
+            elif rendered:
+                print('Generated ' + path + ' page ' + str(page))
+            if entry is not None:
+                manifest.record(*entry)
+            if records is not None:
+                trace.tracer.absorb(records)
+            for output, data in files or ():
+                bundle.submit_bytes(data, output)
+            if indexed:
+                variants.absorb(indexed)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return failed
+
+def watch_templates(root_dir='examples', pages=(1, 2), simulation=False, manifest=None,
+                    fmt='png', dither=None, atlas=None, writer=None, debounce=0.2):
+    """Re-render the pages of the templates a changed file is used by, until interrupted.
+
+    Templates are linked to their icons and images in a dependency graph;
+    a changed template is read again and its links updated, and a new one
+    under root_dir is picked up. The changes of a burst of writes are
+    gathered for debounce seconds before rendering.
+    """
+    root_dir = os.path.abspath(root_dir)
+    graph, models = watch.DependencyGraph(), {}
+
+    def track(path):
+        try:
+            models[path] = template.load(path, gauges=GAUGES)
+        except (OSError, ValueError) as e:
+            print('Error: %s: %s' % (type(e).__name__, e))
+            models[path] = None
+        for page in pages:
+            files = [path]
+            if models[path] is not None:
+                files += assets_of(models[path], simulation, page)
+            graph.set((path, page), files)
+
+    for path in find_templates(root_dir):
+        track(os.path.abspath(path))
+    observer = watch.watcher()
+    observer.track_tree(root_dir, '*.json')
+    observer.track(graph.files())
+    print('Watching %d files of %d templates' % (len(graph.files()), len(models)))
+    try:
+        while True:
+            changed = watch.changes(observer, debounce)
+            start = time.monotonic()
+            for path in changed:
+                if path in models or (path.endswith('.json') and os.path.isfile(path)
+                                      and os.path.commonpath([path, root_dir]) == root_dir):
+                    track(path)
+            targets = graph.affected(changed)
+            for path, page in sorted(targets):
+                if models[path] is None:
+                    continue
+                try:
+                    if main(path, simulation, page, manifest, fmt, dither, atlas, writer,
+                            models[path]):
+                        print('Generated ' + path + ' page ' + str(page))
+                except Exception as e:
+                    print('Error: %s page %d: %s: %s' % (path, page, type(e).__name__, e))
+            if targets:
+                if writer is not None:
+                    writer.flush()
+                if manifest is not None:
+                    manifest.save()
+                print('%d pages checked in %.2f s' % (len(targets), time.monotonic() - start))
+            observer.track(graph.files())
+    finally:
+        observer.close()
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render the e-paper labels of every template.')
+    parser.add_argument('root_dir', nargs='?', default='examples')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='render every page, even if its inputs are unchanged')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='png',
+                        help='PNG or packed panel framebuffer')
+    parser.add_argument('--dither', choices=framebuffer.DITHERS[1:], default=None)
+    parser.add_argument('--sprites', action='store_true',
+                        help='blit gauges from a pre-rendered sprite atlas')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write stage timings as JSON (Chrome trace for *.trace)')
+    parser.add_argument('--writers', type=int, default=2,
+                        help='background PNG writer threads with -j 1 (0: write in place)')
+    parser.add_argument('--compression', type=int, choices=range(10), default=None,
+                        help='zlib level of the PNG encoder (default: cairo\'s)')
+    parser.add_argument('--variants', metavar='DIR',
+                        help='draw images from pre-scaled variants kept in DIR')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='use black and white variants cut at this gray level (0-1)')
+    parser.add_argument('--draft', type=float, nargs='?', const=quality.DRAFT_SCALE, default=None,
+                        metavar='SCALE', help='render fast *_draft previews at SCALE (default %g)'
+                        % quality.DRAFT_SCALE)
+    parser.add_argument('--bundle', metavar='FILE',
+                        help='write every page into one zip or tar archive with a JSON index')
+    parser.add_argument('--watch', action='store_true',
+                        help='then re-render the pages of every changed template or asset')
+    parser.add_argument('--debounce', type=float, default=0.2,
+                        help='seconds to gather a burst of changes in watch mode')
+    args = parser.parse_args()
+    if args.bundle and args.watch:
+        parser.error('--bundle and --watch cannot be used together')
+
+    trace.enable(args.trace is not None)
+    # a bundle is written whole every time, its pages are never up to date
+    manifest = None if args.force or args.bundle else Manifest()
+    variants = None
+    if args.variants or args.threshold is not None:
+        variants = VariantStore(args.variants or '.label_variants', args.threshold)
+    writer = None
+    if args.processes == 1 and args.writers > 0 and not args.bundle:
+        writer = PngWriter(args.writers, args.compression)
+    bundle = Bundle(args.bundle, level=args.compression) if args.bundle else None
+    try:
+        failed = batch(find_templates(args.root_dir), processes=args.processes, manifest=manifest,
+                       fmt=args.format, dither=args.dither, sprites=args.sprites, writer=writer,
+                       variants=variants, bundle=bundle, draft=args.draft)
+    finally:
+        if writer is not None:
+            writer.close()
+        if bundle is not None:
+            bundle.close()
+    if manifest is not None:
+        manifest.save()
+    if variants is not None:
+        variants.save()
+    if args.watch:
+        assets.use_variants(variants)
+        quality.use_draft(args.draft)
+        writer = PngWriter(args.writers, args.compression) if args.writers > 0 else None
+        try:
+            watch_templates(args.root_dir, manifest=manifest, fmt=args.format, dither=args.dither,
+                            atlas=SpriteAtlas() if args.sprites else None, writer=writer,
+                            debounce=args.debounce)
+        except KeyboardInterrupt:
+            # the exit status still reports the first batch
+            pass
+        finally:
+            if writer is not None:
+                writer.close()
+            if variants is not None:
+                variants.save()
+    if args.trace:
+        trace.tracer.save(args.trace)
+    sys.exit(1 if failed else 0)
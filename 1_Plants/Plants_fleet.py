@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: Plants_fleet.py
+%   Description: Renders the e-paper frames of a device fleet, each distinct frame once
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import json
+import datetime
+import argparse
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from labelmaker import assets, framebuffer, template, trace
+from labelmaker.framestore import FrameStore
+from labelmaker.manifest import Manifest
+from labelmaker.sprites import SpriteAtlas
+import Plants_epaper
+
+
+def frame_key(manifest, model, page, shown, fmt='png', dither=None, sprites=False):
+    """Hash of everything a frame is drawn from.
+
+    shown is the (values, date, battery) a page shows, as returned by
+    Plants_epaper.displayed; asset files count by their content.
+    """
+    values, date, battery = shown
+    section = {'config': model.source, 'page': page, 'values': values, 'date': date,
+               'battery': battery, 'fmt': fmt, 'dither': dither, 'sprites': sprites}
+    if assets.cache.variants is not None:
+        section['threshold'] = assets.cache.variants.threshold
+    files = Plants_epaper.assets_of(model, False, page)
+    if battery is not None:
+        files.append(Plants_epaper.battery_icon(battery))
+    return manifest.key(Plants_epaper.RENDERER_VERSION, section, files)
+
+
+def render_fleet(devices, store, page=1, fmt='png', dither=None, atlas=None, manifest=None):
+    """Render the frames of (device_id, template path, readings) tuples.
+
+    readings maps gauge names to values and may hold a 'date' and a
+    'battery' level. Devices whose frames hash the same share one render
+    and one file of the FrameStore, and frames already in it are not drawn
+    again. Returns the device to frame hash mapping and the number of
+    frames rendered.
+    """
+    if manifest is None:
+        manifest = Manifest()
+    extension = '.png' if fmt == 'png' else '.bin'
+    models, renderers, mapping, seen, rendered = {}, {}, {}, set(), 0
+    for device, path, readings in devices:
+        if path not in models:
+            try:
+                with trace.stage('parse'):
+                    models[path] = template.load(path, gauges=Plants_epaper.GAUGES)
+            except (OSError, ValueError) as e:
+                print('Error: %s: %s: %s' % (device, type(e).__name__, e))
+                models[path] = None
+        model = models[path]
+        if model is None:
+            continue
+        shown = Plants_epaper.displayed(page, readings, readings.get('date'),
+                                        readings.get('battery'))
+        digest = frame_key(manifest, model, page, shown, fmt, dither, atlas is not None)
+        if digest not in seen and not store.exists(digest, extension):
+            if path not in renderers:
+                renderers[path] = Plants_epaper.EpaperRenderer(model, page, atlas)
+            with trace.label(digest):
+                surface = renderers[path].update(*shown)
+                with trace.stage('write'):
+                    trace.written(store.put(digest, Plants_epaper.encode(surface, fmt, dither),
+                                            extension))
+            rendered += 1
+        seen.add(digest)
+        mapping[device] = digest
+        store.assign(device, digest)
+    return mapping, rendered
+
+
+def read_devices(path):
+    """(device_id, template, readings) of every line of a JSON lines file.
+
+    Each line is {"device": ..., "template": ..., "readings": {...}}, the
+    readings' date as an ISO 8601 day.
+    """
+    with open(path, 'rt', encoding='utf8') as devices_file:
+        for line in devices_file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            readings = dict(entry.get('readings', {}))
+            if isinstance(readings.get('date'), str):
+                readings['date'] = datetime.date.fromisoformat(readings['date'][:10])
+            yield entry['device'], entry['template'], readings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render the e-paper frames of a device fleet.')
+    parser.add_argument('devices', help='JSON lines file of device, template and readings')
+    parser.add_argument('-o', '--output-dir', default='frames', help='frame store directory')
+    parser.add_argument('--page', type=int, choices=(1, 2), default=1)
+    parser.add_argument('--format', choices=sorted(Plants_epaper.FORMATS), default='png',
+                        help='PNG or packed panel framebuffer')
+    parser.add_argument('--dither', choices=framebuffer.DITHERS[1:], default=None)
+    parser.add_argument('--sprites', action='store_true',
+                        help='blit gauges from a pre-rendered sprite atlas')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write stage timings as JSON (Chrome trace for *.trace)')
+    args = parser.parse_args()
+
+    trace.enable(args.trace is not None)
+    store = FrameStore(args.output_dir)
+    mapping, rendered = render_fleet(read_devices(args.devices), store, args.page, args.format,
+                                     args.dither, SpriteAtlas() if args.sprites else None)
+    store.save()
+    print('%d devices, %d distinct frames, %d rendered' % (len(mapping), len(set(mapping.values())),
+                                                           rendered))
+    if args.trace:
+        trace.tracer.save(args.trace)
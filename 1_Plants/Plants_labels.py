@@ -10,50 +10,64 @@
 %   Date of creation: 8/19/2021
 ------------------------------------------------------------
 """
+import os
+import argparse
 import datetime
-import numpy as np
 import math
 import cairo
-import json
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from labelmaker import assets, quality, template, text, trace, vector
+from labelmaker.bundle import Bundle
+from labelmaker.manifest import Manifest
+from labelmaker.output import PngWriter, save_png
+from labelmaker.sprites import SpriteAtlas
+from labelmaker.variants import VariantStore
 
+RENDERER_VERSION = 1
+GAUGES = ('moisture', 'temperature', 'light', 'fertility')
+
+@trace.timed('image')
 def draw_image(ctx, image, top, left, height, width, rot=0):
     """Draw a scaled image on a given context."""
-    image_surface = cairo.ImageSurface.create_from_png(image)
     # calculate proportional scaling
-    img_height = image_surface.get_height()
-    img_width = image_surface.get_width()
+    img_width, img_height = assets.dimensions(image)
     width_ratio = float(width) / float(img_width)
     height_ratio = float(height) / float(img_height)
     scale_xy = min(height_ratio, width_ratio)
+    if assets.cache.prescale:
+        image_surface = assets.load_scaled(image, img_width*scale_xy, img_height*scale_xy)
+        scale_xy = 1
+    else:
+        image_surface = assets.load(image)
     # scale image and add it
     ctx.save()
     ctx.rotate(rot*math.pi/180)
     ctx.translate(left, top)
     ctx.scale(scale_xy, scale_xy)
     ctx.set_source_surface(image_surface)
+    quality.filter_images(ctx)
 
     ctx.paint()
     ctx.restore()
 
-def plot_parameter(ctx, parameter, value=False, thick=5, angle=270):
-    alpha = np.deg2rad(angle)
-    beta = 2*math.pi - alpha
-
-    rel_range = parameter['rel_range']
-    abs_range = parameter['abs_range']
-    left = parameter['position'][0]
-    top = parameter['position'][1]
-    radius = parameter['radius']
-
-    if rel_range[0] < abs_range[0] or rel_range[1] > abs_range[1]:
-        print('Error: rel_range values are not in abs_range')
-        return
+def gauge_box(gauge, thick=5):
+    """Box (left, top, width, height) a gauge and its needle are drawn in."""
+    margin = thick + 2
+    size = 2*(gauge.radius + margin)
+    return gauge.left - margin, gauge.top - margin, size, size
 
-    value = (np.mean(rel_range)-abs_range[0])/np.abs(abs_range[1]-abs_range[0])*alpha
+def plot_gauge(ctx, gauge, thick=5):
+    """Draw the icon, recommended value arc and contour of a gauge."""
+    beta = gauge.beta
+    left = gauge.left
+    top = gauge.top
+    radius = gauge.radius
+    value = gauge.mid_beta
 
     """ Icon """
     size = radius
-    draw_image(ctx, parameter['icon'],
+    draw_image(ctx, gauge.icon,
                top+radius-size/2,
                left+radius-size/2,
                size,
@@ -61,13 +75,13 @@ def plot_parameter(ctx, parameter, value=False, thick=5, angle=270):
 
     """ Value """
     ctx.set_line_width(1)
-    if 'water' in parameter['icon']:
+    if 'water' in gauge.icon:
         ctx.set_source_rgb(0,191/255,255/255)
-    elif 'sunny' in parameter['icon']:
+    elif 'sunny' in gauge.icon:
         ctx.set_source_rgb(255/255,215/255,0)
-    elif 'thermometer' in parameter['icon']:
+    elif 'thermometer' in gauge.icon:
         ctx.set_source_rgb(255/255,69/255,0)
-    elif 'leaf' in parameter['icon']:
+    elif 'leaf' in gauge.icon:
         ctx.set_source_rgb(50/255,205/255,50/255)
     #
     ctx.move_to(left+radius+(radius-thick)*math.cos(math.pi/2+beta/2), top+radius+(radius-thick)*math.sin(math.pi/2+beta/2))
@@ -86,99 +100,169 @@ def plot_parameter(ctx, parameter, value=False, thick=5, angle=270):
     ctx.arc_negative(left+radius, top+radius, radius-thick, math.pi/2-beta/2, math.pi/2+beta/2)
     ctx.stroke()
 
+@trace.timed('gauge')
+def plot_parameter(ctx, gauge, value=False, thick=5, atlas=None):
+    left = gauge.left
+    top = gauge.top
+    radius = gauge.radius
+
+    """ Gauge """
+    if atlas is not None:
+        key = ('label-gauge', assets.AssetCache.key(gauge.icon),
+               gauge.rel_range, gauge.abs_range, radius, thick, gauge.angle)
+        atlas.draw(ctx, key, *gauge_box(gauge, thick),
+                   render=lambda sprite_ctx: plot_gauge(sprite_ctx, gauge, thick))
+    else:
+        plot_gauge(ctx, gauge, thick)
+
     """ Recomendation"""
-    if 'recomended' in parameter:
-        label = parameter['recomended']
-        xbearing, ybearing, width, height, dx, dy = ctx.text_extents(label)
+    if gauge.recommended is not None:
+        label = gauge.recommended
+        xbearing, ybearing, width, height, dx, dy = text.extents(gauge.font_type,
+                                                                 gauge.font_size-2, label)
         ctx.set_source_rgb(0, 0, 0)
-        ctx.set_font_size(parameter['font_size']-2)
-        ctx.select_font_face(parameter['font_type'],
+        ctx.set_font_size(gauge.font_size-2)
+        ctx.select_font_face(gauge.font_type,
                              cairo.FONT_SLANT_NORMAL,
                              cairo.FONT_WEIGHT_NORMAL)
-        ctx.move_to(left + radius + parameter['font_xoff'] - width / 2, top + 2.7 * radius)
+        ctx.move_to(left + radius + gauge.font_xoff - width / 2, top + 2.7 * radius)
         ctx.show_text(label)
 
-def main(path, simulation=True):
-    with open(path) as json_file:
-        config = json.load(json_file)
-
-    surface = cairo.ImageSurface(cairo.FORMAT_RGB24,
-                                 config['general']['size'][0],
-                                 config['general']['size'][1])
-    ctx = cairo.Context(surface)
-    ctx.scale(1, 1)
+def assets_of(model):
+    """Asset files a template label is drawn from."""
+    files = [model.image.path]
+    if model.life_cycle.display:
+        files.append(model.life_cycle.icon)
+    files += [gauge.icon for gauge in model.parameters]
+    return files
 
-    ctx.rectangle(0, 0, config['general']['size'][0], config['general']['size'][1])
-    # ctx.set_source_rgb(config['general']['background'][0], config['general']['background'][1], config['general']['background'][2])
-    pattern = cairo.LinearGradient(0, 0, 0, config['general']['size'][1])
+def draw_label(ctx, model, atlas=None):
+    ctx.rectangle(0, 0, model.width, model.height)
+    # ctx.set_source_rgb(*model.background)
+    pattern = cairo.LinearGradient(0, 0, 0, model.height)
     pattern.add_color_stop_rgb(0, 50/255, 205/255, 50/255)
     pattern.add_color_stop_rgb(1, 0.5, 0.5, 1)
     ctx.set_source(pattern)
     ctx.fill()
 
     ctx.set_line_width(10)
-    r = config['general']['radius']
+    r = model.radius
     ctx.set_source_rgb(0, 0, 0)
     ctx.arc(r, r, r, math.pi, 3*math.pi/2)
-    ctx.arc(config['general']['size'][0]-r, r, r, 3*math.pi/2, 0)
-    ctx.arc(config['general']['size'][0]-r, config['general']['size'][1]-r, r, 0, math.pi/2)
-    ctx.arc(r, config['general']['size'][1]-r, r, math.pi/2, math.pi)
+    ctx.arc(model.width-r, r, r, 3*math.pi/2, 0)
+    ctx.arc(model.width-r, model.height-r, r, 0, math.pi/2)
+    ctx.arc(r, model.height-r, r, math.pi/2, math.pi)
     ctx.close_path()
     ctx.stroke()
 
     """ Title """
+    title = model.title
     ctx.set_source_rgb(0, 0, 0)
-    ctx.set_font_size(config['title']['font_size'])
-    ctx.select_font_face(config['title']['font_type'],
+    ctx.set_font_size(title.font_size)
+    ctx.select_font_face(title.font_type,
                          cairo.FONT_SLANT_NORMAL,
                          cairo.FONT_WEIGHT_NORMAL)
-    ctx.move_to(config['title']['position'][0], config['title']['position'][1])
-    ctx.show_text(config['title']['value'])
+    ctx.move_to(title.left, title.top)
+    ctx.show_text(title.value)
 
     """ Subtitle """
-    ctx.set_font_size(config['subtitle']['font_size'])
-    ctx.select_font_face(config['subtitle']['font_type'],
+    subtitle = model.subtitle
+    ctx.set_font_size(subtitle.font_size)
+    ctx.select_font_face(subtitle.font_type,
                          cairo.FONT_SLANT_ITALIC,
                          cairo.FONT_WEIGHT_NORMAL)
-    ctx.move_to(config['subtitle']['position'][0], config['subtitle']['position'][1])
-    ctx.show_text(config['subtitle']['value'])
+    ctx.move_to(subtitle.left, subtitle.top)
+    ctx.show_text(subtitle.value)
 
     """ Life-cycle"""
-    if config['life-cycle']['display']:
-        lifespan = config['life-cycle']['span']
-        xbearing, ybearing, width, height, dx, dy = ctx.text_extents(lifespan)
+    if model.life_cycle.display:
+        lifespan = model.life_cycle.span
+        xbearing, ybearing, width, height, dx, dy = text.extents(subtitle.font_type,
+                                                                 subtitle.font_size,
+                                                                 lifespan)
 
-        ctx.set_font_size(config['subtitle']['font_size'])
-        ctx.select_font_face(config['subtitle']['font_type'],
+        ctx.set_font_size(subtitle.font_size)
+        ctx.select_font_face(subtitle.font_type,
                              cairo.FONT_SLANT_NORMAL,
                              cairo.FONT_WEIGHT_NORMAL)
-        ctx.move_to(config['general']['size'][0] - 1.1*width, config['title']['position'][1])
+        ctx.move_to(model.width - 1.1*width, title.top)
         ctx.show_text(lifespan)
 
-        draw_image(ctx, config['life-cycle']['icon'],
-                   config['title']['position'][0],
-                   config['general']['size'][0] - 1.2*width - height,
+        draw_image(ctx, model.life_cycle.icon,
+                   title.left,
+                   model.width - 1.2*width - height,
                    1.2*height,
                    1.2*height)
 
     """ Image """
-    draw_image(ctx, config['image']['path'],
-               config['image']['position'][1],
-               config['image']['position'][0],
-               config['image']['size'][0],
-               config['image']['size'][1])
+    image = model.image
+    draw_image(ctx, image.path, image.top, image.left, image.height, image.width)
 
 
     """ Parameters """
 
-    plot_parameter(ctx, config['parameters']['moisture'])
-    plot_parameter(ctx, config['parameters']['temperature'])
-    plot_parameter(ctx, config['parameters']['light'])
-    plot_parameter(ctx, config['parameters']['fertility'])
+    for name in GAUGES:
+        plot_parameter(ctx, model.gauge(name), atlas=atlas)
 
+def main(path, simulation=True, manifest=None, atlas=None, backend='png', writer=None):
+    """Render the printable label of a template as PNG, PDF or SVG.
 
-    output = path.split('.')[0] + '_label_2.png'
-    surface.write_to_png(output)
+    With a PngWriter the PNG is encoded and written in the background,
+    with a Bundle it goes into that archive.
+    """
+    with trace.stage('parse'):
+        model = template.load(path, gauges=GAUGES)
+
+    output = path.split('.')[0] + '_label_2.' + backend
+    # only raster labels are drawn from the sprite atlas
+    section = {'config': model.source, 'sprites': backend == 'png' and atlas is not None}
+    if quality.current.draft:
+        output = output.replace('_label_2.', '_label_2' + quality.suffix() + '.')
+        section['draft'] = quality.current.draft
+    if manifest is not None:
+        key = manifest.key(RENDERER_VERSION, section, assets_of(model))
+        if manifest.fresh(output, key):
+            return False
+
+    with trace.label(output):
+        if backend == 'png':
+            surface = cairo.ImageSurface(cairo.FORMAT_RGB24, *quality.size(model.width, model.height))
+            ctx = cairo.Context(surface)
+            quality.setup(ctx)
+            draw_label(ctx, model, atlas)
+            save_png(surface, output, writer)
+        else:
+            surface, ctx = vector.document(backend, output, model.width, model.height)
+            draw_label(ctx, model)
+            with trace.stage('write'):
+                surface.finish()
+            trace.written(output)
+
+    if manifest is not None:
+        manifest.record(output, key)
+    return True
+
+def pdf_catalogue(paths, output):
+    """Stream the labels of many templates into one PDF, a page per label.
+
+    Pages are written as they are drawn and every image asset is embedded
+    once, so memory does not grow with the number of labels. Every
+    template is validated before the first page is drawn.
+    """
+    models = [template.load(path, gauges=GAUGES) for path in paths]
+    surface = None
+    for model in models:
+        if surface is None:
+            surface, ctx = vector.document('pdf', output, model.width, model.height)
+        else:
+            surface.set_size(model.width, model.height)
+        with trace.label(model.path):
+            draw_label(ctx, model)
+            ctx.show_page()
+    if surface is not None:
+        with trace.stage('write'):
+            surface.finish()
+        trace.written(output)
 
 if __name__ == "__main__":
 
@@ -186,6 +270,55 @@ if __name__ == "__main__":
              'examples/Coriander/Coriander.json'
     ]
 
-    for path in paths:
-        main(path, simulation=True)
+    parser = argparse.ArgumentParser(description='Render the printable plant labels.')
+    parser.add_argument('backend', nargs='?', choices=vector.BACKENDS, default='png')
+    parser.add_argument('--catalogue', metavar='FILE', default='plant_labels.pdf',
+                        help='the PDF the pdf backend writes every label into, a page each')
+    parser.add_argument('--sprites', action='store_true',
+                        help='blit gauges from a pre-rendered sprite atlas')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write stage timings as JSON (Chrome trace for *.trace)')
+    parser.add_argument('--writers', type=int, default=2,
+                        help='background PNG writer threads (0: write in place)')
+    parser.add_argument('--compression', type=int, choices=range(10), default=None,
+                        help='zlib level of the PNG encoder (default: cairo\'s)')
+    parser.add_argument('--variants', metavar='DIR',
+                        help='draw images from pre-scaled variants kept in DIR')
+    parser.add_argument('--draft', type=float, nargs='?', const=quality.DRAFT_SCALE, default=None,
+                        metavar='SCALE', help='render fast *_draft PNG previews at SCALE (default %g)'
+                        % quality.DRAFT_SCALE)
+    parser.add_argument('--bundle', metavar='FILE',
+                        help='write the PNG labels into one zip or tar archive with a JSON index')
+    args = parser.parse_args()
+    if args.bundle and args.backend != 'png':
+        parser.error('--bundle only holds PNG labels')
+    if args.draft and args.backend != 'png':
+        parser.error('--draft only renders PNG previews')
+
+    trace.enable(args.trace is not None)
+    manifest = None if args.bundle else Manifest()
+    variants = VariantStore(args.variants) if args.variants else None
+    assets.use_variants(variants)
+    quality.use_draft(args.draft)
+    atlas = SpriteAtlas() if args.sprites else None
+    if args.bundle:
+        writer = Bundle(args.bundle, level=args.compression)
+    else:
+        writer = PngWriter(args.writers, args.compression) if args.writers > 0 else None
+    try:
+        if args.backend == 'pdf':
+            pdf_catalogue(paths, args.catalogue)
+        else:
+            for path in paths:
+                main(path, simulation=True, manifest=manifest, atlas=atlas, backend=args.backend,
+                     writer=writer)
+    finally:
+        if writer is not None:
+            writer.close()
+    if manifest is not None:
+        manifest.save()
+    if variants is not None:
+        variants.save()
+    if args.trace:
+        trace.tracer.save(args.trace)
 
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: Plants_timelapse.py
+%   Description: Replays a sensor history log as e-paper frames
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import datetime
+import argparse
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from labelmaker import assets, template, trace
+from labelmaker.output import ApngWriter, FrameArchive
+from labelmaker.sensorlog import SensorLog
+from labelmaker.sprites import SpriteAtlas
+from labelmaker.variants import VariantStore
+import Plants_epaper
+
+
+def timelapse(path, log, output, page=1, delay=0.1, atlas=None, level=6):
+    """Render every record of a SensorLog as a frame of a template page.
+
+    The static layer is drawn once and every frame only draws the readings
+    over it. Records that would show the same frame as the one before are
+    not drawn again; the frame is held for longer instead. output is an
+    animated PNG, or a zip of PNG frames when it ends in .zip. Returns
+    (records, frames).
+    """
+    with trace.stage('parse'):
+        model = template.load(path, gauges=Plants_epaper.GAUGES)
+    renderer = Plants_epaper.EpaperRenderer(model, page, atlas)
+    if output.lower().endswith('.zip'):
+        writer = FrameArchive(output, level)
+    else:
+        writer = ApngWriter(output, *renderer.size, level=level)
+
+    records, pending, previous, repeat = 0, None, None, 0
+    with writer:
+        for timestamp, values, battery in log.readings():
+            records += 1
+            inputs = Plants_epaper.displayed(page, values, datetime.date.fromtimestamp(timestamp),
+                                             battery)
+            if inputs == previous:
+                repeat += 1
+                continue
+            if pending is not None:
+                with trace.stage('write'):
+                    writer.write(pending[0], delay * repeat, pending[1])
+            with trace.label(str(timestamp)):
+                pending = renderer.update(*inputs), timestamp
+            previous, repeat = inputs, 1
+        if pending is not None:
+            with trace.stage('write'):
+                writer.write(pending[0], delay * repeat, pending[1])
+    trace.written(output)
+    return records, writer.frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay a sensor log as e-paper frames.')
+    parser.add_argument('template', help='plant template JSON file')
+    parser.add_argument('log', help='CSV or binary sensor log')
+    parser.add_argument('-o', '--output', default=None,
+                        help='animated PNG, or zip of frames (default: <template>_timelapse.png)')
+    parser.add_argument('--page', type=int, choices=(1, 2), default=1)
+    parser.add_argument('--delay', type=float, default=0.1, help='seconds each record is shown')
+    parser.add_argument('--sprites', action='store_true',
+                        help='blit gauges from a pre-rendered sprite atlas')
+    parser.add_argument('--compression', type=int, choices=range(10), default=6,
+                        help='zlib level of the frames')
+    parser.add_argument('--variants', metavar='DIR',
+                        help='draw images from pre-scaled variants kept in DIR')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write stage timings as JSON (Chrome trace for *.trace)')
+    args = parser.parse_args()
+
+    trace.enable(args.trace is not None)
+    variants = VariantStore(args.variants) if args.variants else None
+    assets.use_variants(variants)
+    output = args.output or args.template.split('.')[0] + '_timelapse.png'
+    try:
+        records, frames = timelapse(args.template, SensorLog(args.log), output, args.page,
+                                    args.delay, SpriteAtlas() if args.sprites else None,
+                                    args.compression)
+    except (OSError, ValueError) as e:
+        print('Error: %s: %s' % (type(e).__name__, e))
+        sys.exit(1)
+    if variants is not None:
+        variants.save()
+    print('%d records, %d frames written to %s' % (records, frames, output))
+    if args.trace:
+        trace.tracer.save(args.trace)
@@ -10,40 +10,58 @@
 %   Date of creation: 8/19/2021
 ------------------------------------------------------------
 """
+import os
+import argparse
 import datetime
 import numpy as np
 import math
 import cairo
 import yaml
+import time
+import itertools
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from labelmaker import assets, quality, text, trace, vector, watch
+from labelmaker.bundle import Bundle
+from labelmaker.catalogue import Catalogue
+from labelmaker.imposition import BAND, PAPERS, Imposition
+from labelmaker.manifest import Manifest
+from labelmaker.output import PngWriter, save_png
+from labelmaker.variants import VariantStore
+
+RENDERER_VERSION = 1
+# printed size of the 3x8 A4 grid labels were laid out in before
+SCALE = 2.25
+
+def frame(layout, section):
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, *quality.size(layout.width, layout.height))
+    ctx = cairo.Context(surface)
+    quality.setup(ctx)
+    draw_frame(ctx, layout, section)
+    return ctx, surface
 
-def frame(config, spice):
-    surface = cairo.ImageSurface(cairo.FORMAT_RGB24,
-                                 config['general']['size'][0],
-                                 config['general']['size'][1])
+def draw_frame(ctx, layout, section):
     pad = 2
-    grad = config['general']['color grad']
-    r, g, b = spice['color']
+    grad = layout.grad
+    r, g, b = section.color
     r0, g0, b0 = r + grad, g + grad, b + grad
     r1, g1, b1 = r - grad, g - grad, b - grad
 
-    ctx = cairo.Context(surface)
-    ctx.scale(1, 1)
     ctx.set_source_rgb(0, 0, 0)
-    ctx.rectangle(0, 0, config['general']['size'][0], config['general']['size'][1])
+    ctx.rectangle(0, 0, layout.width, layout.height)
     ctx.fill()
 
-    ctx.rectangle(pad, pad, config['general']['size'][0]-2*pad, config['general']['size'][1]-2*pad)
-    pattern = cairo.LinearGradient(0, 0, 0, config['general']['size'][1])
+    ctx.rectangle(pad, pad, layout.width-2*pad, layout.height-2*pad)
+    pattern = cairo.LinearGradient(0, 0, 0, layout.height)
     pattern.add_color_stop_rgb(0, r0 / 255, g0 / 255, b0 / 255)
     pattern.add_color_stop_rgb(1, r1 / 255, g1 / 255, b1 / 255)
     ctx.set_source(pattern)
     ctx.fill()
 
-    roundrect(ctx, config['general']['pad'], config['general']['pad'],
-              config['general']['size'][0] - 2 * config['general']['pad'],
-              config['general']['size'][1] - 2 * config['general']['pad'],
-              config['general']['radius'])
-    return ctx, surface
+    roundrect(ctx, layout.pad, layout.pad,
+              layout.width - 2 * layout.pad,
+              layout.height - 2 * layout.pad,
+              layout.radius)
 
 def roundrect(ctx, x, y, width, height, rad=10, thickness=2, color=[255,255,255]):
     r,g,b = [x/255 for x in color]
@@ -66,32 +84,33 @@ def roundrect(ctx, x, y, width, height, rad=10, thickness=2, color=[255,255,255]
     ctx.set_line_width(thickness);
     ctx.stroke();
 
+def best_rotation(w, h):
+    """Angle in degrees (0-90) that makes the rotated bounding box squarest.
+
+    The box aspect (w*cos + h*sin) / (w*sin + h*cos) is exactly 1 at 45
+    degrees for any w != h, while a square image is square at every angle,
+    so the first minimum of the whole 0-90 search is 0.
+    """
+    if w == h:
+        return 0
+    return 45
+
+@trace.timed('image')
 def draw_image(ctx, image, xc, yc, width, height, angle=None):
     ctx.save()
-    image_surface = cairo.ImageSurface.create_from_png(image)
-
-    w = image_surface.get_width()
-    h = image_surface.get_height()
+    w, h = assets.dimensions(image)
     scale_xy = min(width/w, height/h)
     w = scale_xy * w
     h = scale_xy * h
+    if assets.cache.prescale:
+        image_surface = assets.load_scaled(image, w, h)
+        scale_xy = 1
+    else:
+        image_surface = assets.load(image)
 
     """ Best rotation """
-    width_rot = []
-    height_rot = []
-    comb = []
-    for theta in np.arange(0,91):
-        theta = theta*math.pi/180
-        width = w * abs(np.cos(theta)) + h * abs(np.sin(theta))
-        height = w * abs(np.sin(theta)) + h * abs(np.cos(theta))
-
-        width_rot.append(width)
-        height_rot.append(height)
-        comb.append(abs(1-abs(width/ height)))
-    comb = np.array(comb)
     if angle is None:
-        angle = np.argmin(comb)
-    print(angle)
+        angle = best_rotation(w, h)
 
     """ Computations """
     angle = angle * math.pi / 180
@@ -136,30 +155,25 @@ def draw_image(ctx, image, xc, yc, width, height, angle=None):
     """ Scale & write """
     ctx.scale(scale_xy, scale_xy)
     ctx.set_source_surface(image_surface, 0, 0)
+    quality.filter_images(ctx)
     ctx.paint()
     ctx.restore()
     return
 
-def names(ctx, config, spice):
+@trace.timed('names')
+def names(ctx, layout, spice):
+    """Write the three names, each at the largest size that fits the text box."""
+    box = layout.text
     ctx.set_source_rgb(0, 0, 0)
-    ctx.set_font_size(config['text']['size'])
-    ctx.select_font_face(config['text']['type'],
+    ctx.select_font_face(box.font_type,
                          cairo.FONT_SLANT_NORMAL,
                          cairo.FONT_WEIGHT_NORMAL)
-    xc, yc, w, h = config['text']['x'], config['text']['y'],\
-                   config['text']['width'], config['text']['height']
-
-    for string, ii in zip([spice['es'], spice['en'], spice['de']], [-1, 0, 1]):
-        text_props = ctx.text_extents(string)
-        ts = w/text_props.width
-        if ts < 1:
-            size = config['text']['size'] - ((1-ts)*config['text']['scale'])
-
-        elif ts > 1:
-            size = config['text']['size'] + 2
+    xc, yc, w, h = box.x, box.y, box.width, box.height
 
+    for string, ii in zip([spice.es, spice.en, spice.de], [-1, 0, 1]):
+        size = text.fit(box.font_type, string, w, box.size + 2)
         ctx.set_font_size(size)
-        text_props = ctx.text_extents(string)
+        text_props = text.extents(box.font_type, size, string)
 
         nx = -text_props.width/2
         ny = text_props.height/2
@@ -168,63 +182,308 @@ def names(ctx, config, spice):
         ctx.move_to(x, y)
         ctx.show_text(string)
 
-def main(path, simulation=True):
-    with open(path, 'rt', encoding='utf8') as yaml_file:
-        config = yaml.load(yaml_file)
-
-    """ Individual labels generator """
-    labels = []
-    for spice_type in config['spices']:
-        for spice in config['spices'][spice_type]['items']:
-            ctx, surface = frame(config, config['spices'][spice_type])
-
-            draw_image(ctx, spice['img'],
-                       config['image']['x'],
-                       config['image']['y'],
-                       config['image']['width'],
-                       config['image']['height'])
-            names(ctx, config, spice)
-
-            output = '.\labels\\' + spice['es'] + '_label.png'
-            surface.write_to_png(output)
-            labels.append(output)
-    """ Gropu by 24 labels """
-    pad = 25
-    w, h =  2480, 3508
-    width, height = w-2*pad, h-2*pad
-    a4 = cairo.ImageSurface(cairo.FORMAT_RGB24,w, h)
-    ctx = cairo.Context(a4)
-    ctx.scale(1, 1)
-    ctx.set_source_rgb(1, 1, 1)
-    ctx.rectangle(0, 0, w, h)
-    ctx.fill()
-    idx = 0
-    for column in np.arange(pad, width, width/3):
-        for row in np.arange(pad, height, height/8):
-            ctx.save()
-            image_surface = cairo.ImageSurface.create_from_png(labels[idx])
-            w = image_surface.get_width()
-            h = image_surface.get_height()
-            scale_xy = min((width/3)/ w, (height/8) / h)
-            w = scale_xy * w
-            h = scale_xy * h
-            ctx.translate(column, row)
-
-            ctx.scale(scale_xy, scale_xy)
-            ctx.set_source_surface(image_surface, 0, 0)
-            ctx.paint()
-            ctx.restore()
-
-            idx = idx + 1
-
-    output = '.\labels\Labels.png'
-    a4.write_to_png(output)
+def label(layout, section, spice):
+    """Render the label of a single spice."""
+    with trace.label(spice.es):
+        ctx, surface = frame(layout, section)
+        draw_contents(ctx, layout, spice)
+    return surface
+
+def draw_contents(ctx, layout, spice):
+    draw_image(ctx, spice.img,
+               layout.image.x,
+               layout.image.y,
+               layout.image.width,
+               layout.image.height)
+    names(ctx, layout, spice)
+
+def label_key(manifest, layout, section, spice):
+    inputs = [layout.source, section.color, [spice.en, spice.es, spice.de, spice.img]]
+    if quality.current.draft:
+        inputs.append(quality.current.draft)
+    return manifest.key(RENDERER_VERSION, inputs, [spice.img])
+
+def imposition_key(imposition):
+    return [imposition.size, imposition.dpi, imposition.margin, imposition.gap,
+            imposition.scale, imposition.guides, imposition.rotate]
+
+def chunked(items, size):
+    """Lists of up to size consecutive items, read lazily."""
+    items = iter(items)
+    chunk = list(itertools.islice(items, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(items, size))
+
+def impose_vector(layout, items, backend, output, imposition):
+    """Draw the labels straight into PDF pages or SVG files, as vectors.
+
+    Every label is drawn at its packed place with the same calls as the
+    raster path; image assets come from the shared cache, so each one is
+    embedded once per document.
+    """
+    w, h = imposition.size
+    surface, ctx, page, current = None, None, 0, []
+
+    def sizes():
+        for item in items:
+            current.append(item)
+            yield layout.width, layout.height
+
+    for placement in imposition.place(sizes()):
+        if placement.sheet != page:
+            if surface is not None and backend == 'svg':
+                surface.finish()
+                surface = None
+            elif surface is not None:
+                ctx.show_page()
+            page = placement.sheet
+            if surface is None:
+                page_output = output
+                if backend == 'svg':
+                    page_output = output.replace('.svg', '_page_' + str(page) + '.svg')
+                surface, ctx = vector.document(backend, page_output, w, h, imposition.dpi)
+
+        section, spice = current.pop()
+        ctx.save()
+        imposition.transform(ctx, placement)
+        ctx.rectangle(0, 0, layout.width, layout.height)
+        ctx.clip()
+        draw_frame(ctx, layout, section)
+        draw_contents(ctx, layout, spice)
+        ctx.restore()
+        imposition.guide(ctx, placement)
+    if surface is not None:
+        if backend != 'svg':
+            ctx.show_page()
+        surface.finish()
+
+def write_sheets(layout, chunks, output_dir, imposition, write_labels=False, manifest=None,
+                 writer=None, band=None):
+    """Raster print sheets, one PNG per sheet of chunk labels.
+
+    With band, sheets are drawn and encoded that many rows at a time
+    instead of as one surface; labels are then drawn as vectors into every
+    band they cross, which also keeps them sharp at any dpi.
+    """
+    for page, chunk in enumerate(chunks, 1):
+        outputs = [os.path.join(output_dir, spice.es + '_label.png') for section, spice in chunk]
+        output = os.path.join(output_dir, 'Labels_page_' + str(page) + '.png')
+
+        """ Skip sheets whose labels are unchanged """
+        if manifest is not None:
+            keys = [label_key(manifest, layout, section, spice) for section, spice in chunk]
+            key = manifest.key(RENDERER_VERSION, [imposition_key(imposition), bool(band)] + keys)
+            fresh = [manifest.fresh(o, k) for o, k in zip(outputs, keys)]
+            if manifest.fresh(output, key) and (not write_labels or all(fresh)):
+                continue
+
+        """ Individual labels generator """
+        def surfaces(sheet=True):
+            for idx, (section, spice) in enumerate(chunk):
+                write = write_labels and not (manifest is not None and fresh[idx])
+                if not (sheet or write):
+                    continue
+                surface = label(layout, section, spice)
+                if write:
+                    save_png(surface, outputs[idx], writer)
+                    if manifest is not None:
+                        manifest.record(outputs[idx], keys[idx])
+                yield surface
+
+        if band:
+            # the sheet is drawn from vectors; only labels to write are rendered
+            for surface in surfaces(sheet=False):
+                pass
+            write_banded(layout, chunk, output, imposition, band,
+                         6 if writer is None or writer.level is None else writer.level)
+        else:
+            for a4 in imposition.compose(surfaces()):
+                save_png(a4, output, writer)
+        if manifest is not None:
+            manifest.record(output, key)
+
+def write_banded(layout, chunk, output, imposition, band, level=6):
+    """Stream one sheet of chunk labels into a PNG, band rows at a time."""
+    placements = list(imposition.place([quality.size(layout.width, layout.height)] * len(chunk)))
+
+    def draw(ctx, placement):
+        section, spice = chunk[placement.index]
+        with trace.label(spice.es):
+            quality.setup(ctx)
+            draw_frame(ctx, layout, section)
+            draw_contents(ctx, layout, spice)
+
+    with trace.stage('write'):
+        imposition.render_bands(output, placements, draw, band, level)
+    trace.written(output)
+
+def write_document(catalogue, backend, output_dir, imposition, manifest=None):
+    """Vector print sheets: one multi-page PDF, or one SVG per sheet.
+
+    With a manifest the catalogue is read twice: once to key the
+    document, once to draw it.
+    """
+    output = os.path.join(output_dir, 'Labels.' + backend)
+    first = output.replace('.svg', '_page_1.svg')
+    layout = catalogue.layout
+    if manifest is not None:
+        key = manifest.key(RENDERER_VERSION,
+                           [backend, imposition_key(imposition)] + [label_key(manifest, layout, section, spice)
+                                        for section, spice in catalogue])
+        if manifest.fresh(first, key):
+            return
+    with trace.stage('document'):
+        impose_vector(layout, catalogue, backend, output, imposition)
+    if manifest is not None:
+        manifest.record(first, key)
+
+def main(path, simulation=True, write_labels=False, output_dir='labels', manifest=None,
+         backend='png', writer=None, imposition=None, band=None):
+    """Render the spice catalogue onto print sheets.
+
+    backend 'png' writes raster sheets, 'pdf' a single multi-page
+    vector document and 'svg' one vector file per sheet. write_labels
+    also writes every label as its own PNG. With a PngWriter, PNGs are
+    encoded and written in the background; with a Bundle they go into
+    that one archive. imposition sets the paper,
+    margins and cut guides (A4 at 300 dpi by default); band draws raster
+    sheets that many rows at a time, for large papers or high dpi.
+    Drafts go to output_dir + '_draft', their sheets at the draft's
+    fraction of the dpi.
+    """
+    if imposition is None:
+        imposition = Imposition(dpi=300 * quality.factor(), scale=SCALE)
+    output_dir += quality.suffix()
+    with trace.stage('parse'):
+        catalogue = Catalogue(path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    """ Group by as many labels as a sheet holds, streaming the catalogue """
+    if backend == 'png':
+        capacity = imposition.capacity(*quality.size(catalogue.layout.width,
+                                                     catalogue.layout.height))
+        write_sheets(catalogue.layout, chunked(catalogue, capacity), output_dir, imposition,
+                     write_labels, manifest, writer, band)
+        return
+
+    write_document(catalogue, backend, output_dir, imposition, manifest)
+    if write_labels:
+        for section, spice in catalogue:
+            output = os.path.join(output_dir, spice.es + '_label.png')
+            surface = label(catalogue.layout, section, spice)
+            save_png(surface, output, writer)
+
+def watch_catalogues(paths, debounce=0.2, **options):
+    """Render a catalogue again whenever it or one of its images changes, until interrupted.
+
+    options are passed on to main(); with a manifest only the labels and
+    sheets drawn from a changed file are rendered again.
+    """
+    graph = watch.DependencyGraph()
+
+    def track(path):
+        files = [path]
+        try:
+            files += [spice.img for section, spice in Catalogue(path)]
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            print('Error: %s: %s' % (type(e).__name__, e))
+        graph.set(path, files)
+
+    for path in paths:
+        track(path)
+    observer = watch.watcher()
+    observer.track(graph.files())
+    try:
+        while True:
+            for path in sorted(graph.affected(watch.changes(observer, debounce))):
+                start = time.monotonic()
+                try:
+                    main(path, **options)
+                except (OSError, ValueError, yaml.YAMLError) as e:
+                    print('Error: %s: %s' % (type(e).__name__, e))
+                if options.get('writer') is not None:
+                    options['writer'].flush()
+                if options.get('manifest') is not None:
+                    options['manifest'].save()
+                track(path)
+                observer.track(graph.files())
+                print('%s rendered in %.2f s' % (path, time.monotonic() - start))
+    finally:
+        observer.close()
 
 if __name__ == "__main__":
 
     paths = ['config.yaml'
     ]
 
-    for path in paths:
-        main(path, simulation=True)
-
+    parser = argparse.ArgumentParser(description='Render the spice labels and print sheets.')
+    parser.add_argument('backend', nargs='?', choices=vector.BACKENDS, default='png')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write stage timings as JSON (Chrome trace for *.trace)')
+    parser.add_argument('--writers', type=int, default=2,
+                        help='background PNG writer threads (0: write in place)')
+    parser.add_argument('--compression', type=int, choices=range(10), default=None,
+                        help='zlib level of the PNG encoder (default: cairo\'s)')
+    parser.add_argument('--variants', metavar='DIR',
+                        help='draw images from pre-scaled variants kept in DIR')
+    parser.add_argument('--paper', choices=sorted(PAPERS), default='A4')
+    parser.add_argument('--dpi', type=float, default=300)
+    parser.add_argument('--margin', type=float, default=2, help='sheet margin in mm')
+    parser.add_argument('--gap', type=float, default=0, help='space between labels in mm')
+    parser.add_argument('--scale', type=float, default=SCALE,
+                        help='sheet pixels per label pixel')
+    parser.add_argument('--no-guides', action='store_true', help='do not draw cut guides')
+    parser.add_argument('--no-labels', action='store_true',
+                        help='only write the sheets, not a PNG per label')
+    parser.add_argument('--draft', type=float, nargs='?', const=quality.DRAFT_SCALE, default=None,
+                        metavar='SCALE', help='render fast previews at SCALE (default %g) into '
+                        'labels_draft' % quality.DRAFT_SCALE)
+    parser.add_argument('--bundle', metavar='FILE',
+                        help='write the PNG labels and sheets into one zip or tar archive')
+    parser.add_argument('--watch', action='store_true',
+                        help='then render again whenever the catalogue or an image changes')
+    parser.add_argument('--debounce', type=float, default=0.2,
+                        help='seconds to gather a burst of changes in watch mode')
+    parser.add_argument('--band', type=int, nargs='?', const=BAND, default=None, metavar='ROWS',
+                        help='draw raster sheets ROWS rows at a time (default %d) to bound memory'
+                        % BAND)
+    args = parser.parse_args()
+    if args.bundle and (args.band or args.watch):
+        parser.error('--bundle cannot be used with --band or --watch')
+    if args.bundle and args.backend != 'png':
+        parser.error('--bundle only holds PNG labels and sheets')
+
+    trace.enable(args.trace is not None)
+    manifest = None if args.bundle else Manifest()
+    variants = VariantStore(args.variants) if args.variants else None
+    assets.use_variants(variants)
+    quality.use_draft(args.draft)
+    imposition = Imposition(args.paper, args.dpi * quality.factor(), args.margin, args.gap, args.scale,
+                            not args.no_guides)
+    if args.bundle:
+        writer = Bundle(args.bundle, level=args.compression)
+    else:
+        writer = PngWriter(args.writers, args.compression) if args.writers > 0 else None
+    options = dict(simulation=True, write_labels=not args.no_labels, manifest=manifest, backend=args.backend,
+                   writer=writer, imposition=imposition, band=args.band)
+    try:
+        for path in paths:
+            main(path, **options)
+        if args.watch:
+            manifest.save()
+            watch_catalogues(paths, args.debounce, **options)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+    if manifest is not None:
+        manifest.save()
+    if variants is not None:
+        variants.save()
+    report = imposition.report()
+    if report['sheets']:
+        print('%d sheets, %.1f%% used' % (report['sheets'], 100 * report['utilization']))
+    if args.trace:
+        trace.tracer.save(args.trace)
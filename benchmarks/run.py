@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: run.py
+%   Description: Render benchmarks on synthetic plant and spice catalogues
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import sys
+import copy
+import json
+import time
+import random
+import fnmatch
+import argparse
+import datetime
+import platform
+import resource
+import tempfile
+import multiprocessing
+import numpy as np
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLANTS = os.path.join(ROOT, '1_Plants')
+SPICES = os.path.join(ROOT, '2_Spices')
+RESOURCES = os.path.join(ROOT, '0_Resources')
+sys.path[:0] = [ROOT, PLANTS, SPICES]
+
+CASES = ('plants_labels', 'plants_epaper_1', 'plants_epaper_2', 'spices_labels')
+
+
+def resolve(path, base=PLANTS):
+    return os.path.normpath(os.path.join(base, path))
+
+
+def plant_templates(n, out_dir, seed=0):
+    """Write n synthetic plant templates varied from the examples."""
+    rng = random.Random(seed)
+    examples = []
+    for path, dirs, files in os.walk(os.path.join(PLANTS, 'examples')):
+        for file in sorted(fnmatch.filter(files, '*.json')):
+            with open(os.path.join(path, file)) as json_file:
+                config = json.load(json_file)
+            if os.path.exists(resolve(config['image']['path'])):
+                examples.append(config)
+
+    paths = []
+    for idx in range(n):
+        config = copy.deepcopy(examples[idx % len(examples)])
+        config['title']['value'] += ' ' + str(idx)
+        for element in ('image', 'bubble'):
+            config[element]['path'] = resolve(config[element]['path'])
+        for element in ('life-cycle', 'synchronized'):
+            config[element]['icon'] = resolve(config[element]['icon'])
+        for parameter in config['parameters'].values():
+            parameter['icon'] = resolve(parameter['icon'])
+            low, high = parameter['abs_range']
+            a, b = sorted(rng.uniform(low, high) for _ in range(2))
+            parameter['rel_range'] = [round(a, 1), round(b, 1)]
+        # the printable label also draws a fertility gauge
+        fertility = copy.deepcopy(config['parameters']['humidity'])
+        fertility['icon'] = os.path.join(RESOURCES, 'leaf.png')
+        config['parameters'].setdefault('fertility', fertility)
+
+        path = os.path.join(out_dir, 'plant_' + str(idx) + '.json')
+        with open(path, 'w') as json_file:
+            json.dump(config, json_file)
+        paths.append(path)
+    return paths
+
+
+def spice_catalog(n, out_dir, seed=0):
+    """Write a config.yaml-shaped catalogue of n spices."""
+    rng = random.Random(seed)
+    with open(os.path.join(SPICES, 'config.yaml'), 'rt', encoding='utf8') as yaml_file:
+        config = yaml.safe_load(yaml_file)
+    images = sorted(fnmatch.filter(os.listdir(os.path.join(RESOURCES, 'spices')), '*.png'))
+    sections = list(config['spices'].values())
+    config['spices'] = {}
+    for idx in range(n):
+        section = config['spices'].setdefault('type_' + str(idx % len(sections)), {
+            'color': sections[idx % len(sections)]['color'], 'items': []})
+        name = os.path.splitext(images[idx % len(images)])[0]
+        section['items'].append({
+            'es': name + '_' + str(idx),
+            'en': name.replace('_', ' ') * rng.randint(1, 2),
+            'de': name.upper(),
+            'img': os.path.join(RESOURCES, 'spices', images[idx % len(images)])})
+
+    path = os.path.join(out_dir, 'catalog.yaml')
+    with open(path, 'w', encoding='utf8') as yaml_file:
+        yaml.safe_dump(config, yaml_file, allow_unicode=True)
+    return path
+
+
+def timed(jobs):
+    latencies = []
+    for job in jobs:
+        start = time.perf_counter()
+        job()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_case(case, size, seed):
+    """Render one case in this process and return its measurements."""
+    import Plants_labels
+    import Plants_epaper
+    import Spices_labels
+    from labelmaker import trace
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        if case == 'spices_labels':
+            path = spice_catalog(size, tmp, seed)
+            # per-label latencies come from the trace of the same run
+            trace.enable()
+            start = time.perf_counter()
+            Spices_labels.main(path, output_dir=os.path.join(tmp, 'labels'))
+            seconds = time.perf_counter() - start
+            latencies = [label['ms'] / 1000 for label in trace.tracer.labels]
+        else:
+            paths = plant_templates(size, tmp, seed)
+            start = time.perf_counter()
+            if case == 'plants_labels':
+                latencies = timed([lambda path=path: Plants_labels.main(path) for path in paths])
+            else:
+                page = int(case[-1])
+                latencies = timed([lambda path=path: Plants_epaper.main(path, page=page)
+                                   for path in paths])
+            seconds = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {'case': case,
+            'labels': size,
+            'seconds': seconds,
+            'labels_per_sec': size / seconds,
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def isolated(args):
+    """Run a case in its own process, so peak RSS is the case's own."""
+    case, size, seed = args
+    try:
+        return run_case(case, size, seed)
+    except Exception as e:
+        return {'case': case, 'labels': size, 'error': '%s: %s' % (type(e).__name__, e)}
+
+
+def run(sizes, cases=CASES, seed=0):
+    import cairo
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for size in sizes:
+        for case in cases:
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                result = pool.apply(isolated, ((case, size, seed),))
+            results.append(result)
+            if 'error' in result:
+                print('%-16s %6d  error: %s' % (case, size, result['error']))
+            else:
+                print('%-16s %6d  %8.1f labels/s  p50 %7.2f ms  p99 %7.2f ms  %8d KB'
+                      % (case, size, result['labels_per_sec'], result['p50_ms'],
+                         result['p99_ms'], result['peak_rss_kb']))
+    return {'meta': {'date': datetime.datetime.now().isoformat(),
+                     'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'numpy': np.__version__,
+                     'cairo': cairo.cairo_version_string(),
+                     'seed': seed},
+            'results': results}
+
+
+def compare(old, new):
+    """Print the throughput ratio of every case present in both runs."""
+    before = {(r['case'], r['labels']): r for r in old['results'] if 'error' not in r}
+    for result in new['results']:
+        previous = before.get((result['case'], result['labels']))
+        if previous is None or 'error' in result:
+            continue
+        print('%-16s %6d  x%.2f labels/s  p99 %7.2f -> %7.2f ms'
+              % (result['case'], result['labels'],
+                 result['labels_per_sec'] / previous['labels_per_sec'],
+                 previous['p99_ms'], result['p99_ms']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the label renderers.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+                        help='catalogue sizes, e.g. 10 100 1000 10000')
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='benchmark.json')
+    parser.add_argument('--compare', metavar='BASELINE', help='earlier results to compare with')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.cases, args.seed)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=1)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(json.load(baseline_file), report)
@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: __init__.py
+%   Description: Shared helpers for the label renderers
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
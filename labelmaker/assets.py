@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: assets.py
+%   Description: Shared cache of decoded PNG assets
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import struct
+import collections
+import cairo
+
+
+class AssetCache(object):
+    """Bounded LRU cache of decoded PNG surfaces keyed by path and mtime.
+
+    Optionally keeps a second LRU of surfaces already scaled to a target
+    size, so repeated icons are painted without resampling. With a
+    variant store, scaled surfaces are also read from (and written to)
+    disk, so the full-size source is only decoded once per size ever.
+    """
+
+    def __init__(self, size=64, scaled_size=256, prescale=False, variants=None):
+        self.size = size
+        self.scaled_size = scaled_size
+        self.prescale = prescale or variants is not None
+        self.variants = variants
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = collections.OrderedDict()
+        self._scaled = collections.OrderedDict()
+        self._dimensions = {}
+
+    @staticmethod
+    def key(path):
+        path = os.path.abspath(path)
+        return path, os.stat(path).st_mtime_ns
+
+    def _get(self, store, key):
+        surface = store.get(key)
+        if surface is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        store.move_to_end(key)
+        return surface
+
+    @staticmethod
+    def _put(store, key, surface, size):
+        store[key] = surface
+        while len(store) > size:
+            store.popitem(last=False)
+
+    def load(self, path):
+        """Return the decoded surface of a PNG file."""
+        key = self.key(path)
+        surface = self._get(self._surfaces, key)
+        if surface is None:
+            surface = cairo.ImageSurface.create_from_png(key[0])
+            # lets PDF/SVG documents embed the asset once however often it is drawn
+            surface.set_mime_data(cairo.MIME_TYPE_UNIQUE_ID, ('%s:%d' % key).encode())
+            self._put(self._surfaces, key, surface, self.size)
+        return surface
+
+    def dimensions(self, path):
+        """Width and height of a PNG file, read from its header without decoding."""
+        key = self.key(path)
+        dimensions = self._dimensions.get(key)
+        if dimensions is None:
+            with open(key[0], 'rb') as png_file:
+                header = png_file.read(24)
+            if header[:8] != b'\x89PNG\r\n\x1a\n' or header[12:16] != b'IHDR':
+                raise ValueError('Not a PNG file: ' + key[0])
+            dimensions = self._dimensions[key] = struct.unpack('>II', header[16:24])
+        return dimensions
+
+    def load_scaled(self, path, width, height):
+        """Return the PNG file resampled to width x height pixels."""
+        width, height = max(1, int(round(width))), max(1, int(round(height)))
+        key = self.key(path) + (width, height)
+        surface = self._get(self._scaled, key)
+        if surface is None:
+            variant = self.variants and self.variants.lookup(path, width, height)
+            if variant:
+                surface = cairo.ImageSurface.create_from_png(variant)
+            else:
+                surface = self.resample(self.load(path), width, height)
+                if self.variants is not None:
+                    variant = self.variants.store(surface, path, width, height)
+            if variant:
+                surface.set_mime_data(cairo.MIME_TYPE_UNIQUE_ID, variant.encode())
+            self._put(self._scaled, key, surface, self.scaled_size)
+        return surface
+
+    def resample(self, source, width, height):
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        ctx = cairo.Context(surface)
+        ctx.scale(width / source.get_width(), height / source.get_height())
+        ctx.set_source_surface(source)
+        ctx.get_source().set_filter(cairo.FILTER_GOOD)
+        ctx.paint()
+        surface.flush()
+        if self.variants is not None and self.variants.threshold is not None:
+            self.variants.binarize(surface)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self._scaled.clear()
+        self._dimensions.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'surfaces': len(self._surfaces),
+                'scaled': len(self._scaled)}
+
+
+cache = AssetCache()
+
+
+def load(path):
+    """Decode a PNG through the shared cache."""
+    return cache.load(path)
+
+
+def load_scaled(path, width, height):
+    """Scale a PNG through the shared cache."""
+    return cache.load_scaled(path, width, height)
+
+
+def dimensions(path):
+    return cache.dimensions(path)
+
+
+def use_variants(variants):
+    """Draw images through pre-scaled variants from a store (None: stop)."""
+    cache.variants = variants
+    cache.prescale = variants is not None
+    cache._scaled.clear()
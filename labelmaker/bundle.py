@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: bundle.py
+%   Description: Single-archive output of many labels
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import io
+import os
+import json
+import time
+import struct
+import tarfile
+import zipfile
+import argparse
+
+from labelmaker import trace
+from labelmaker.output import encode_png
+
+# fixed part of a zip local file header, name and extra lengths at its end
+ZIP_HEADER = 30
+
+
+def png_bytes(surface, level=None):
+    """PNG data of a surface, by cairo's encoder or ours at a zlib level."""
+    if level is not None:
+        return encode_png(surface, level)
+    buffer = io.BytesIO()
+    surface.write_to_png(buffer)
+    return buffer.getvalue()
+
+
+class Bundle(object):
+    """A zip or tar archive every output is streamed into, in one sequential write.
+
+    It stands in for a PngWriter: outputs are added under their path
+    relative to root, stored as they are (PNG data is compressed already).
+    close() writes `<archive>.json`, the offset and length of every
+    member's data, so read() gets one label back with a single seek.
+    """
+
+    def __init__(self, path, root='.', level=None):
+        self.path = path
+        self.root = root
+        self.level = level
+        self.index = {}
+        if path.lower().endswith('.tar'):
+            self._tar, self._zip = tarfile.open(path, 'w', format=tarfile.PAX_FORMAT), None
+        else:
+            self._tar, self._zip = None, zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED)
+
+    def name(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def submit(self, surface, path):
+        self.submit_bytes(png_bytes(surface, self.level), path)
+
+    def submit_bytes(self, data, path):
+        name = self.name(path)
+        with trace.stage('write'):
+            if self._zip is not None:
+                self._zip.writestr(name, data)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size, info.mtime = len(data), time.time()
+                header = info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors)
+                self.index[name] = [self._tar.offset + len(header), len(data)]
+                self._tar.addfile(info, io.BytesIO(data))
+        trace.wrote(len(data))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._zip is not None:
+            if self._zip.fp is None:
+                return
+            infos = self._zip.infolist()
+            self._zip.close()
+            with open(self.path, 'rb') as archive:
+                for info in infos:
+                    archive.seek(info.header_offset + ZIP_HEADER - 4)
+                    name_length, extra_length = struct.unpack('<HH', archive.read(4))
+                    self.index[info.filename] = [info.header_offset + ZIP_HEADER + name_length
+                                                 + extra_length, info.file_size]
+        else:
+            if self._tar.closed:
+                return
+            self._tar.close()
+        temporary = self.path + '.json.tmp'
+        with open(temporary, 'w') as index_file:
+            json.dump(self.index, index_file, indent=1, sort_keys=True)
+        os.replace(temporary, self.path + '.json')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class Collector(object):
+    """Keeps a worker process' outputs in memory until they are drained
+    and handed to the Bundle of the main process."""
+
+    def __init__(self, level=None):
+        self.level = level
+        self.files = []
+
+    def submit(self, surface, path):
+        self.files.append((path, png_bytes(surface, self.level)))
+
+    def submit_bytes(self, data, path):
+        self.files.append((path, data))
+
+    def drain(self):
+        files, self.files = self.files, []
+        return files
+
+
+def read(path, name):
+    """Bytes of one member of a bundle, found through its index."""
+    with open(path + '.json') as index_file:
+        offset, length = json.load(index_file)[name]
+    with open(path, 'rb') as archive:
+        archive.seek(offset)
+        return archive.read(length)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='List a label bundle or extract one label.')
+    parser.add_argument('bundle', help='zip or tar bundle with its .json index')
+    parser.add_argument('name', nargs='?', help='label to extract')
+    parser.add_argument('-o', '--output', default=None, help='where to write it (default: its name)')
+    args = parser.parse_args()
+
+    if args.name is None:
+        with open(args.bundle + '.json') as index_file:
+            for name, (offset, length) in sorted(json.load(index_file).items()):
+                print('%10d %s' % (length, name))
+    else:
+        output = args.output or os.path.basename(args.name)
+        with open(output, 'wb') as output_file:
+            output_file.write(read(args.bundle, args.name))
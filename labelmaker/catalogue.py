@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: catalogue.py
+%   Description: Streaming, validated spice catalogue reader
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import yaml
+
+from labelmaker import trace
+from labelmaker.template import Model, TemplateError, canonical, get, number, numbers_of, string
+
+# libyaml's parser when PyYAML was built with it; both are safe loaders
+LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+LAYOUT = ('general', 'text', 'image')
+
+
+class NotStreamable(Exception):
+    """The catalogue uses anchors, aliases or merge keys, which need the whole document."""
+
+
+class TextBox(Model):
+    __slots__ = ('x', 'y', 'width', 'height', 'font_type', 'size', 'scale')
+
+
+class ImageBox(Model):
+    __slots__ = ('x', 'y', 'width', 'height')
+
+
+class Layout(Model):
+    __slots__ = ('source', 'width', 'height', 'pad', 'radius', 'grad', 'text', 'image')
+
+
+class Section(Model):
+    __slots__ = ('name', 'color')
+
+
+class Spice(Model):
+    __slots__ = ('en', 'es', 'de', 'img')
+
+
+def compile_layout(sections):
+    """Validate the general/text/image sections of a catalogue."""
+    general, text, image = (get(sections, name, 'catalogue') for name in LAYOUT)
+    width, height = numbers_of(general, 'size', 'general', 2)
+    return Layout(source=canonical(sections),
+                  width=width,
+                  height=height,
+                  pad=number(general, 'pad', 'general'),
+                  radius=number(general, 'radius', 'general'),
+                  grad=number(general, 'color grad', 'general'),
+                  text=TextBox(x=number(text, 'x', 'text'),
+                               y=number(text, 'y', 'text'),
+                               width=number(text, 'width', 'text'),
+                               height=number(text, 'height', 'text'),
+                               font_type=string(text, 'type', 'text'),
+                               size=number(text, 'size', 'text'),
+                               scale=number(text, 'scale', 'text')),
+                  image=ImageBox(x=number(image, 'x', 'image'),
+                                 y=number(image, 'y', 'image'),
+                                 width=number(image, 'width', 'image'),
+                                 height=number(image, 'height', 'image')))
+
+
+def compile_section(name, color):
+    where = 'spices.' + str(name)
+    color = numbers_of({'color': color}, 'color', where, 3)
+    if any(c < 0 or c > 255 for c in color):
+        raise TemplateError('%s.color: components must be 0-255, got %r' % (where, color))
+    return Section(name=name, color=color)
+
+
+def compile_spice(item, where, base_dir='.'):
+    names = {}
+    for language in ('en', 'es', 'de'):
+        names[language] = string(item, language, where)
+        if not names[language].strip():
+            raise TemplateError('%s.%s: empty name' % (where, language))
+    img = os.path.abspath(os.path.join(base_dir, string(item, 'img', where)))
+    if not os.path.isfile(img):
+        raise TemplateError('%s.img: no such file %s' % (where, img))
+    return Spice(img=img, **names)
+
+
+def plain(event):
+    """Raise NotStreamable on an event only a full load can resolve."""
+    if (isinstance(event, yaml.AliasEvent) or getattr(event, 'anchor', None) is not None
+            or isinstance(event, yaml.ScalarEvent) and event.value == '<<'
+            and event.tag is None and event.implicit[0]):
+        raise NotStreamable(str(event.start_mark))
+    return event
+
+
+def value(loader):
+    """Build the value of the next node of the event stream."""
+    event = plain(loader.get_event())
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style)
+        constructor = loader.yaml_constructors.get(tag, loader.yaml_constructors[None])
+        return constructor(loader, node)
+    if isinstance(event, yaml.SequenceStartEvent):
+        items = []
+        while not loader.check_event(yaml.SequenceEndEvent):
+            items.append(value(loader))
+        loader.get_event()
+        return items
+    if isinstance(event, yaml.MappingStartEvent):
+        mapping = {}
+        for key in keys(loader, event):
+            mapping[key] = value(loader)
+        return mapping
+    raise TemplateError('Unsupported YAML %s at %s' % (type(event).__name__, event.start_mark))
+
+
+def skip(loader):
+    """Consume the next node of the event stream without building it."""
+    depth = 0
+    while True:
+        event = plain(loader.get_event())
+        if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+            depth += 1
+        elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            depth -= 1
+        if depth == 0:
+            return
+
+
+def keys(loader, start=None):
+    """Keys of the mapping starting at start (or at the next event).
+
+    Each key is yielded with its value next in the stream, to be read
+    with value(), skip() or a nested keys() before asking for the next.
+    """
+    if start is None:
+        start = plain(loader.get_event())
+    if not isinstance(start, yaml.MappingStartEvent):
+        raise TemplateError('Expected a mapping at %s' % start.start_mark)
+    while not loader.check_event(yaml.MappingEndEvent):
+        yield value(loader)
+    loader.get_event()
+
+
+class Catalogue(object):
+    """A spice catalogue read lazily from its YAML file.
+
+    The layout is read when the catalogue is opened. Iterating it yields
+    (Section, Spice) pairs straight from the YAML event stream, each one
+    validated as it is read, so rendering starts at the first item and
+    memory does not grow with the number of spices. Every iteration reads
+    the file again. A catalogue using anchors, aliases or merge keys is
+    loaded whole instead, by the same safe loader.
+    """
+
+    def __init__(self, path, base_dir='.'):
+        self.path = path
+        self.base_dir = base_dir
+        self.streaming = True
+        self.layout = self._read_layout()
+
+    def _events(self):
+        """Loader positioned inside the top-level mapping, and its file."""
+        catalogue_file = open(self.path, 'rt', encoding='utf8')
+        try:
+            loader = LOADER(catalogue_file)
+            loader.get_event()
+            if not loader.check_event(yaml.DocumentStartEvent):
+                loader.dispose()
+                raise TemplateError(self.path + ': empty catalogue')
+            loader.get_event()
+        except Exception:
+            catalogue_file.close()
+            raise
+        return catalogue_file, loader
+
+    def _document(self):
+        """The whole catalogue, for the documents that cannot be streamed."""
+        with open(self.path, 'rt', encoding='utf8') as catalogue_file:
+            document = yaml.load(catalogue_file, Loader=LOADER)
+        if not isinstance(document, dict):
+            raise TemplateError(self.path + ': empty catalogue')
+        return document
+
+    def _read_layout(self):
+        sections = {}
+        catalogue_file, loader = self._events()
+        try:
+            for key in keys(loader):
+                if key in LAYOUT:
+                    sections[key] = value(loader)
+                    if len(sections) == len(LAYOUT):
+                        break
+                else:
+                    skip(loader)
+        except NotStreamable:
+            self.streaming = False
+            document = self._document()
+            sections = {name: document[name] for name in LAYOUT if name in document}
+        except TemplateError as e:
+            raise TemplateError(self.path + ': ' + str(e))
+        finally:
+            loader.dispose()
+            catalogue_file.close()
+        try:
+            return compile_layout(sections)
+        except TemplateError as e:
+            raise TemplateError(self.path + ': ' + str(e))
+
+    def _section(self, loader, name):
+        color, pending = None, None
+        for key in keys(loader):
+            if key == 'color':
+                section = compile_section(name, value(loader))
+                color = section.color
+                # items met before their colour were kept until now
+                for index, item in enumerate(pending or ()):
+                    yield section, compile_spice(item, 'spices.%s.items[%d]' % (name, index),
+                                                 self.base_dir)
+                pending = None
+            elif key == 'items':
+                if not isinstance(plain(loader.peek_event()), yaml.SequenceStartEvent):
+                    raise TemplateError('spices.%s.items: expected a list' % name)
+                loader.get_event()
+                if color is None:
+                    pending = []
+                index = 0
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    with trace.stage('parse'):
+                        item = value(loader)
+                    if color is None:
+                        pending.append(item)
+                    else:
+                        yield section, compile_spice(item, 'spices.%s.items[%d]' % (name, index),
+                                                     self.base_dir)
+                    index += 1
+                loader.get_event()
+            else:
+                skip(loader)
+        if color is None:
+            raise TemplateError('spices.%s: missing color' % name)
+
+    def _pairs(self, document):
+        """(Section, Spice) pairs of a catalogue loaded whole."""
+        spices = document.get('spices', {})
+        if not isinstance(spices, dict):
+            raise TemplateError('spices: expected a mapping')
+        for name, contents in spices.items():
+            if not isinstance(contents, dict) or 'color' not in contents:
+                raise TemplateError('spices.%s: missing color' % name)
+            section = compile_section(name, contents['color'])
+            items = contents.get('items', [])
+            if not isinstance(items, list):
+                raise TemplateError('spices.%s.items: expected a list' % name)
+            for index, item in enumerate(items):
+                yield section, compile_spice(item, 'spices.%s.items[%d]' % (name, index),
+                                             self.base_dir)
+
+    def _stream(self):
+        catalogue_file, loader = self._events()
+        try:
+            for key in keys(loader):
+                if key != 'spices':
+                    skip(loader)
+                    continue
+                for name in keys(loader):
+                    for pair in self._section(loader, name):
+                        yield pair
+        finally:
+            loader.dispose()
+            catalogue_file.close()
+
+    def __iter__(self):
+        yielded = 0
+        try:
+            if self.streaming:
+                try:
+                    for pair in self._stream():
+                        yield pair
+                        yielded += 1
+                    return
+                except NotStreamable:
+                    # everything before the first anchor streams alike
+                    self.streaming = False
+            for index, pair in enumerate(self._pairs(self._document())):
+                if index >= yielded:
+                    yield pair
+        except TemplateError as e:
+            raise TemplateError(self.path + ': ' + str(e))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: framebuffer.py
+%   Description: Packed 1bpp/2bpp e-paper framebuffers
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import numpy as np
+
+from labelmaker.partial import surface_array
+
+DITHERS = (None, 'ordered', 'floyd-steinberg')
+
+BAYER = (np.array([[0, 8, 2, 10],
+                   [12, 4, 14, 6],
+                   [3, 11, 1, 9],
+                   [15, 7, 13, 5]], dtype=np.float32) + 0.5) / 16
+
+
+def luminance(pixels):
+    """Gray level in [0, 1] of RGB24 pixels."""
+    r = (pixels >> 16) & 0xff
+    g = (pixels >> 8) & 0xff
+    b = pixels & 0xff
+    return (0.299*r + 0.587*g + 0.114*b).astype(np.float32) / 255
+
+
+def ordered(gray, levels):
+    h, w = gray.shape
+    threshold = np.tile(BAYER, (h // 4 + 1, w // 4 + 1))[:h, :w]
+    return np.clip(np.floor(gray*(levels-1) + threshold), 0, levels-1).astype(np.uint8)
+
+
+def floyd_steinberg(gray, levels):
+    """Floyd-Steinberg error diffusion, vectorized over anti-diagonals.
+
+    Pixel (y, x) only depends on pixels with a smaller 2*y + x, so every
+    pixel of a wavefront t = 2*y + x is quantized in one NumPy step.
+    """
+    h, w = gray.shape
+    buf = np.zeros((h + 1, w + 2), dtype=np.float32)
+    buf[:h, 1:w+1] = gray
+    out = np.empty((h, w), dtype=np.uint8)
+    rows = np.arange(h)
+    for t in range(w + 2*(h-1)):
+        ys = rows[max(0, (t-w+2) // 2):min(h, t // 2 + 1)]
+        xs = t - 2*ys
+        old = buf[ys, xs+1]
+        new = np.clip(np.rint(old*(levels-1)), 0, levels-1)
+        out[ys, xs] = new
+        err = old - new/(levels-1)
+        buf[ys, xs+2] += err*7/16
+        buf[ys+1, xs] += err*3/16
+        buf[ys+1, xs+1] += err*5/16
+        buf[ys+1, xs+2] += err/16
+    return out
+
+
+def quantize(gray, bpp=1, dither=None):
+    """Gray levels in [0, 1] to integer levels 0 .. 2**bpp - 1."""
+    levels = 1 << bpp
+    if dither is None:
+        return np.clip(np.rint(gray*(levels-1)), 0, levels-1).astype(np.uint8)
+    if dither == 'ordered':
+        return ordered(gray, levels)
+    if dither == 'floyd-steinberg':
+        return floyd_steinberg(gray, levels)
+    raise ValueError('Unknown dither: ' + str(dither))
+
+
+def pack(levels, bpp=1):
+    """Pack integer levels MSB first, every row padded to a whole byte."""
+    if bpp == 1:
+        return np.packbits(levels.astype(bool), axis=1)
+    if bpp == 2:
+        h, w = levels.shape
+        padded = np.zeros((h, -(-w // 4) * 4), dtype=np.uint8)
+        padded[:, :w] = levels
+        quads = padded.reshape(h, -1, 4)
+        return quads[..., 0] << 6 | quads[..., 1] << 4 | quads[..., 2] << 2 | quads[..., 3]
+    raise ValueError('Unsupported depth: ' + str(bpp))
+
+
+def to_bytes(surface, bpp=1, dither=None, invert=False):
+    """Packed framebuffer of an RGB24 surface, white as the highest level.
+
+    A 296x128 frame is 4736 bytes at 1bpp and 9472 bytes at 2bpp.
+    """
+    gray = luminance(surface_array(surface))
+    if invert:
+        gray = 1 - gray
+    return pack(quantize(gray, bpp, dither), bpp).tobytes()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: framestore.py
+%   Description: Content-addressed store of rendered frames
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import json
+
+
+class FrameStore(object):
+    """Frames kept once under the hash of the inputs they were drawn from.
+
+    A frame lives in `directory/<hash[:2]>/<hash><extension>`, so any
+    number of devices showing the same frame share one file. The device
+    to frame hash mapping is kept in devices.json.
+    """
+
+    def __init__(self, directory='frames'):
+        self.directory = directory
+        self.devices_path = os.path.join(directory, 'devices.json')
+        try:
+            with open(self.devices_path) as devices_file:
+                self.devices = json.load(devices_file)
+        except (OSError, ValueError):
+            self.devices = {}
+
+    def path(self, digest, extension='.png'):
+        return os.path.join(self.directory, digest[:2], digest + extension)
+
+    def exists(self, digest, extension='.png'):
+        return os.path.isfile(self.path(digest, extension))
+
+    def put(self, digest, data, extension='.png'):
+        path = self.path(digest, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + '.' + str(os.getpid()) + '.tmp'
+        with open(temporary, 'wb') as frame_file:
+            frame_file.write(data)
+        os.replace(temporary, path)
+        return path
+
+    def assign(self, device, digest):
+        self.devices[str(device)] = digest
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = self.devices_path + '.' + str(os.getpid()) + '.tmp'
+        with open(temporary, 'w') as devices_file:
+            json.dump(self.devices, devices_file, indent=1, sort_keys=True)
+        os.replace(temporary, self.devices_path)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: imposition.py
+%   Description: Bin-packing of labels of any size onto print sheets
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import math
+import argparse
+import cairo
+
+from labelmaker import quality
+from labelmaker.output import PngStream
+
+# rows of a sheet rasterized at a time in banded mode
+BAND = 256
+# paper sizes in millimetres
+PAPERS = {'A3': (297, 420), 'A4': (210, 297), 'A5': (148, 210),
+          'letter': (215.9, 279.4), 'legal': (215.9, 355.6)}
+
+
+def mm_to_px(mm, dpi):
+    return mm * dpi / 25.4
+
+
+class MaxRects(object):
+    """One sheet packed with the maximal-rectangles algorithm.
+
+    The free space is kept as the list of maximal empty rectangles; a new
+    rectangle goes where it leaves the shortest leftover side (best short
+    side fit), optionally turned by 90 degrees.
+    """
+
+    def __init__(self, width, height, rotate=True):
+        self.width = width
+        self.height = height
+        self.rotate = rotate
+        self.free = [(0, 0, width, height)]
+        self.placed = []
+
+    def insert(self, w, h):
+        """Place a w x h rectangle; return (x, y, rotated) or None if it does not fit."""
+        orientations = [(w, h, False)]
+        if self.rotate and w != h:
+            orientations.append((h, w, True))
+        best = None
+        for fx, fy, fw, fh in self.free:
+            for rw, rh, rotated in orientations:
+                if rw <= fw and rh <= fh:
+                    score = min(fw - rw, fh - rh), max(fw - rw, fh - rh)
+                    if best is None or score < best[0]:
+                        best = score, (fx, fy, rw, rh, rotated)
+        if best is None:
+            return None
+        x, y, rw, rh, rotated = best[1]
+        self._split(x, y, rw, rh)
+        self.placed.append((x, y, rw, rh))
+        return x, y, rotated
+
+    def _split(self, x, y, w, h):
+        free = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+                free.append((fx, fy, fw, fh))
+                continue
+            if x > fx:
+                free.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                free.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                free.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                free.append((fx, y + h, fw, fy + fh - y - h))
+        self.free = [rect for i, rect in enumerate(free)
+                     if not any(contains(other, rect) and (other != rect or j < i)
+                                for j, other in enumerate(free) if j != i)]
+
+
+def contains(outer, inner):
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2]
+            and inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+class Placement(object):
+    """Where a label lands: sheet number, top-left corner and printed size."""
+    __slots__ = ('index', 'sheet', 'x', 'y', 'width', 'height', 'rotated')
+
+    def __init__(self, index, sheet, x, y, width, height, rotated):
+        self.index = index
+        self.sheet = sheet
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.rotated = rotated
+
+
+class Imposition(object):
+    """Packs labels of mixed sizes onto print sheets.
+
+    Sizes are in label pixels; a label is printed `scale` sheet pixels per
+    label pixel. Paper, margin and gap are in millimetres at `dpi`. Every
+    packed sheet's utilization (label area over printable area) is kept in
+    `utilization`.
+    """
+
+    def __init__(self, paper='A4', dpi=300, margin=2, gap=0, scale=1, guides=True, rotate=True):
+        width, height = PAPERS[paper] if isinstance(paper, str) else paper
+        self.dpi = dpi
+        self.size = int(round(mm_to_px(width, dpi))), int(round(mm_to_px(height, dpi)))
+        self.margin = mm_to_px(margin, dpi)
+        self.gap = mm_to_px(gap, dpi)
+        self.scale = scale
+        self.guides = guides
+        self.rotate = rotate
+        self.utilization = []
+
+    def _sheet(self):
+        # every label carries a gap on its right and bottom, so does the bin
+        return MaxRects(self.size[0] - 2*self.margin + self.gap,
+                        self.size[1] - 2*self.margin + self.gap, self.rotate)
+
+    def _placement(self, index, page, sheet, width, height):
+        w, h = width*self.scale, height*self.scale
+        spot = sheet.insert(w + self.gap, h + self.gap)
+        if spot is None:
+            return None
+        x, y, rotated = spot
+        if rotated:
+            w, h = h, w
+        return Placement(index, page, self.margin + x, self.margin + y, w, h, rotated)
+
+    def _close(self, sheet):
+        printable = (self.size[0] - 2*self.margin) * (self.size[1] - 2*self.margin)
+        labels = sum((w - self.gap) * (h - self.gap) for x, y, w, h in sheet.placed)
+        self.utilization.append(labels / printable)
+
+    def place(self, sizes):
+        """Pack sizes in the given order, a sheet at a time; yields a Placement each.
+
+        Sheets are filled one after the other, so this streams: a sheet is
+        final once the first label of the next one is placed.
+        """
+        page, sheet = 0, None
+        for index, (width, height) in enumerate(sizes):
+            placement = None
+            if sheet is not None:
+                placement = self._placement(index, page, sheet, width, height)
+            if placement is None:
+                if sheet is not None:
+                    self._close(sheet)
+                page, sheet = page + 1, self._sheet()
+                placement = self._placement(index, page, sheet, width, height)
+                if placement is None:
+                    raise ValueError('A %gx%g label does not fit on the sheet' % (width, height))
+            yield placement
+        if sheet is not None:
+            self._close(sheet)
+
+    def pack(self, sizes):
+        """Pack all sizes at once, largest first, into the fewest sheets found.
+
+        Returns a list of sheets, each a list of Placements whose index
+        refers to sizes.
+        """
+        order = sorted(range(len(sizes)), key=lambda i: (max(sizes[i]), sizes[i][0]*sizes[i][1]),
+                       reverse=True)
+        sheets, pages = [], []
+        for index in order:
+            width, height = sizes[index]
+            for page, sheet in enumerate(sheets, 1):
+                placement = self._placement(index, page, sheet, width, height)
+                if placement is not None:
+                    break
+            else:
+                sheets.append(self._sheet())
+                pages.append([])
+                placement = self._placement(index, len(sheets), sheets[-1], width, height)
+                if placement is None:
+                    raise ValueError('A %gx%g label does not fit on the sheet' % (width, height))
+            pages[placement.sheet - 1].append(placement)
+        for sheet in sheets:
+            self._close(sheet)
+        return pages
+
+    def capacity(self, width, height):
+        """How many width x height labels fit on one sheet."""
+        sheet, count = self._sheet(), 0
+        while self._placement(count, 1, sheet, width, height) is not None:
+            count += 1
+        return count
+
+    def report(self):
+        return {'sheets': len(self.utilization),
+                'utilization': (sum(self.utilization) / len(self.utilization)
+                                if self.utilization else 0),
+                'per_sheet': list(self.utilization)}
+
+    def blank(self):
+        """A white raster sheet and its context."""
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, *self.size)
+        ctx = cairo.Context(surface)
+        ctx.set_source_rgb(1, 1, 1)
+        ctx.paint()
+        return ctx, surface
+
+    def transform(self, ctx, placement):
+        """Map label pixel coordinates onto the placement."""
+        ctx.translate(placement.x, placement.y)
+        if placement.rotated:
+            ctx.translate(placement.width, 0)
+            ctx.rotate(math.pi / 2)
+        ctx.scale(self.scale, self.scale)
+
+    def guide(self, ctx, placement):
+        """Hairline cut guide around a placed label."""
+        if not self.guides:
+            return
+        ctx.save()
+        ctx.set_source_rgb(0.6, 0.6, 0.6)
+        ctx.set_line_width(max(1, self.dpi / 300))
+        ctx.rectangle(placement.x, placement.y, placement.width, placement.height)
+        ctx.stroke()
+        ctx.restore()
+
+    def paint(self, ctx, placement, surface):
+        ctx.save()
+        self.transform(ctx, placement)
+        ctx.set_source_surface(surface, 0, 0)
+        quality.filter_images(ctx)
+        ctx.paint()
+        ctx.restore()
+        self.guide(ctx, placement)
+
+    def compose(self, surfaces):
+        """Composite label surfaces onto raster sheets, yielding each full sheet.
+
+        Only the sheet being filled is kept in memory.
+        """
+        surfaces = iter(surfaces)
+        current = []
+
+        def sizes():
+            for surface in surfaces:
+                current.append(surface)
+                yield surface.get_width(), surface.get_height()
+
+        ctx, sheet, page = None, None, 0
+        for placement in self.place(sizes()):
+            if placement.sheet != page:
+                if sheet is not None:
+                    yield sheet
+                ctx, sheet = self.blank()
+                page = placement.sheet
+            self.paint(ctx, placement, current.pop())
+        if sheet is not None:
+            yield sheet
+
+    def render_bands(self, output, placements, draw, band=BAND, level=6):
+        """Rasterize one sheet into a PNG file, `band` rows at a time.
+
+        draw(ctx, placement) draws a label in label pixels. Each band is a
+        surface of its own, shifted up under the sheet's coordinates, and
+        only the labels crossing it are drawn again there; so memory grows
+        with the band, not with the paper size or dpi.
+        """
+        width, height = self.size
+        with PngStream(output, width, height, level=level) as png:
+            for top in range(0, height, band):
+                rows = min(band, height - top)
+                surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, rows)
+                ctx = cairo.Context(surface)
+                ctx.set_source_rgb(1, 1, 1)
+                ctx.paint()
+                ctx.translate(0, -top)
+                for placement in placements:
+                    if placement.y >= top + rows or placement.y + placement.height <= top:
+                        continue
+                    w, h = placement.width / self.scale, placement.height / self.scale
+                    if placement.rotated:
+                        w, h = h, w
+                    ctx.save()
+                    self.transform(ctx, placement)
+                    ctx.rectangle(0, 0, w, h)
+                    ctx.clip()
+                    draw(ctx, placement)
+                    ctx.restore()
+                    self.guide(ctx, placement)
+                surface.flush()
+                png.write(surface)
+
+
+def impose_files(paths, output_dir, imposition):
+    """Pack existing label PNGs of any sizes onto as few sheets as possible."""
+    sizes = []
+    for path in paths:
+        surface = cairo.ImageSurface.create_from_png(path)
+        sizes.append((surface.get_width(), surface.get_height()))
+    outputs = []
+    for page, placements in enumerate(imposition.pack(sizes), 1):
+        ctx, sheet = imposition.blank()
+        for placement in placements:
+            imposition.paint(ctx, placement, cairo.ImageSurface.create_from_png(paths[placement.index]))
+        outputs.append(os.path.join(output_dir, 'Sheet_' + str(page) + '.png'))
+        sheet.write_to_png(outputs[-1])
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pack label PNGs of any sizes onto print sheets.')
+    parser.add_argument('labels', nargs='+', help='label PNG files')
+    parser.add_argument('-o', '--output-dir', default='sheets')
+    parser.add_argument('--paper', choices=sorted(PAPERS), default='A4')
+    parser.add_argument('--dpi', type=float, default=300)
+    parser.add_argument('--margin', type=float, default=2, help='sheet margin in mm')
+    parser.add_argument('--gap', type=float, default=0, help='space between labels in mm')
+    parser.add_argument('--scale', type=float, default=1, help='sheet pixels per label pixel')
+    parser.add_argument('--no-guides', action='store_true', help='do not draw cut guides')
+    parser.add_argument('--no-rotate', action='store_true', help='never turn labels')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    imposition = Imposition(args.paper, args.dpi, args.margin, args.gap, args.scale,
+                            not args.no_guides, not args.no_rotate)
+    impose_files(args.labels, args.output_dir, imposition)
+    report = imposition.report()
+    print('%d sheets, %.1f%% used' % (report['sheets'], 100 * report['utilization']))
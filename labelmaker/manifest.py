@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: manifest.py
+%   Description: Build manifest for incremental label rebuilds
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import json
+import hashlib
+
+
+class Manifest(object):
+    """Content hashes of the inputs every output was last rendered from.
+
+    An output key covers the renderer version, the template section it was
+    drawn from and the bytes of every asset it references, so an output is
+    only rebuilt when one of those changes or the file is gone.
+    """
+
+    def __init__(self, path='.label_manifest.json'):
+        self.path = path
+        self.entries = {}
+        self._files = {}
+        try:
+            with open(path) as manifest_file:
+                self.entries = json.load(manifest_file)
+        except (OSError, ValueError):
+            pass
+
+    def file_hash(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 'missing'
+        memo = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        if memo not in self._files:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as asset:
+                for block in iter(lambda: asset.read(1 << 16), b''):
+                    digest.update(block)
+            self._files[memo] = digest.hexdigest()
+        return self._files[memo]
+
+    def key(self, version, section, files=()):
+        """Hash of a renderer version, a config section and asset files."""
+        digest = hashlib.sha256()
+        digest.update(str(version).encode())
+        digest.update(json.dumps(section, sort_keys=True, default=str).encode())
+        for path in files:
+            digest.update(path.encode())
+            digest.update(self.file_hash(path).encode())
+        return digest.hexdigest()
+
+    def fresh(self, output, key):
+        return self.entries.get(output) == key and os.path.exists(output)
+
+    def record(self, output, key):
+        self.entries[output] = key
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as manifest_file:
+            json.dump(self.entries, manifest_file, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
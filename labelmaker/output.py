@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: output.py
+%   Description: PNG encoding and pipelined output writing
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import json
+import zlib
+import struct
+import zipfile
+import threading
+import concurrent.futures
+import numpy as np
+import cairo
+
+from labelmaker import trace
+from labelmaker.partial import surface_array
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def png_rows(surface):
+    """Rows of 8-bit RGB (RGB24) or straight RGBA (ARGB32) samples."""
+    pixels = surface_array(surface)
+    channels = [(pixels >> 16) & 0xff, (pixels >> 8) & 0xff, pixels & 0xff]
+    if surface.get_format() == cairo.FORMAT_ARGB32:
+        alpha = (pixels >> 24) & 0xff
+        # cairo stores premultiplied colour
+        safe = np.maximum(alpha, 1)
+        channels = [np.where(alpha > 0, (c * 255 + safe // 2) // safe, 0) for c in channels]
+        channels.append(alpha)
+    elif surface.get_format() != cairo.FORMAT_RGB24:
+        raise ValueError('Only RGB24 and ARGB32 surfaces can be encoded')
+    return np.stack(channels, axis=-1).astype(np.uint8).reshape(pixels.shape[0], -1)
+
+
+def png_header(width, height, rgba=False):
+    return PNG_SIGNATURE + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8,
+                                                          6 if rgba else 2, 0, 0, 0))
+
+
+def filter_up(rows, previous=None):
+    """PNG 'Up' filter of every row, each prefixed by its filter type byte.
+
+    previous is the row above the first one, when rows continue an image.
+    """
+    filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0] if previous is None else rows[0] - previous
+    filtered[1:, 1:] = rows[1:] - rows[:-1]
+    return filtered
+
+
+def encode_png(surface, level=6):
+    """PNG bytes of an image surface at a given zlib compression level.
+
+    Rows use the 'Up' filter, which suits flat label artwork; zlib runs
+    without the GIL, so several encoders can work in parallel threads.
+    """
+    rows = png_rows(surface)
+    rgba = surface.get_format() == cairo.FORMAT_ARGB32
+    return (png_header(surface.get_width(), surface.get_height(), rgba)
+            + png_chunk(b'IDAT', zlib.compress(filter_up(rows).tobytes(), level))
+            + png_chunk(b'IEND', b''))
+
+
+class PngStream(object):
+    """A PNG file written a band of rows at a time.
+
+    Every band is filtered and fed to one zlib stream whose output goes
+    out as IDAT chunks straight away, so only the band being written is
+    held in memory, never the whole image.
+    """
+
+    def __init__(self, path, width, height, rgba=False, level=6):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._previous = None
+        self._compressor = zlib.compressobj(level)
+        self._file = open(path, 'wb')
+        self._file.write(png_header(width, height, rgba))
+
+    def _idat(self, data):
+        if data:
+            self._file.write(png_chunk(b'IDAT', data))
+
+    def write(self, surface):
+        """Append the rows of a surface as wide as the image."""
+        if surface.get_width() != self.width or self.rows + surface.get_height() > self.height:
+            raise ValueError('Band does not fit the %dx%d image' % (self.width, self.height))
+        rows = png_rows(surface)
+        self._idat(self._compressor.compress(filter_up(rows, self._previous).tobytes()))
+        self._previous = rows[-1].copy()
+        self.rows += rows.shape[0]
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.rows != self.height:
+                raise ValueError('%s: %d of %d rows written' % (self.path, self.rows, self.height))
+            self._idat(self._compressor.flush())
+            self._file.write(png_chunk(b'IEND', b''))
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._file.close()
+        return False
+
+
+class ApngWriter(object):
+    """An animated PNG written a frame at a time.
+
+    Frames are encoded as they come, so only the current one is held in
+    memory; the frame count in the header is filled in by close(). An
+    APNG needs a frame at least: closed without any, the file is removed
+    and close() raises ValueError.
+    """
+
+    def __init__(self, path, width, height, level=6, plays=0):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.level = level
+        self.plays = plays
+        self.frames = 0
+        self._sequence = 0
+        self._file = open(path, 'wb')
+        self._file.write(png_header(width, height))
+        self._actl = self._file.tell()
+        self._file.write(self._animation_control())
+
+    def _animation_control(self):
+        return png_chunk(b'acTL', struct.pack('>II', self.frames, self.plays))
+
+    def _next(self):
+        self._sequence += 1
+        return self._sequence - 1
+
+    def write(self, surface, delay=0.1, timestamp=None):
+        """Append a frame shown for delay seconds (up to 65 s); timestamp is not kept."""
+        if surface.get_format() != cairo.FORMAT_RGB24:
+            raise ValueError('Only RGB24 frames can be animated')
+        data = zlib.compress(filter_up(png_rows(surface)).tobytes(), self.level)
+        milliseconds = min(65535, max(1, int(round(delay * 1000))))
+        self._file.write(png_chunk(b'fcTL', struct.pack('>IIIIIHHBB', self._next(), self.width,
+                                                        self.height, 0, 0, milliseconds, 1000,
+                                                        0, 0)))
+        if self.frames == 0:
+            self._file.write(png_chunk(b'IDAT', data))
+        else:
+            self._file.write(png_chunk(b'fdAT', struct.pack('>I', self._next()) + data))
+        self.frames += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.frames == 0:
+            self._file.close()
+            os.remove(self.path)
+            raise ValueError(self.path + ': no frames to animate')
+        try:
+            self._file.write(png_chunk(b'IEND', b''))
+            self._file.seek(self._actl)
+            self._file.write(self._animation_control())
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.close()
+        except ValueError:
+            # keep the error that left the block without a frame
+            if exc[0] is None:
+                raise
+        return False
+
+
+class FrameArchive(object):
+    """A zip file of numbered PNG frames written a frame at a time.
+
+    index.json lists every frame with its delay in seconds and timestamp;
+    a frame can be read back on its own with zipfile.
+    """
+
+    def __init__(self, path, level=6):
+        self.path = path
+        self.level = level
+        self.frames = 0
+        self.index = []
+        self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED)
+
+    def write(self, surface, delay=0.1, timestamp=None):
+        name = 'frame_%06d.png' % self.frames
+        # PNG data is compressed already
+        self._zip.writestr(name, encode_png(surface, self.level))
+        self.index.append({'name': name, 'delay': delay, 'timestamp': timestamp})
+        self.frames += 1
+
+    def close(self):
+        if self._zip.fp is None:
+            return
+        try:
+            self._zip.writestr('index.json', json.dumps(self.index, indent=1))
+        finally:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class PngWriter(object):
+    """Encodes and writes finished surfaces on a bounded thread pool.
+
+    submit() returns as soon as a slot is free, so drawing the next label
+    overlaps with encoding and writing the previous ones; once `queue`
+    surfaces are pending it blocks, which bounds the memory held. A
+    level of None keeps cairo's own encoder.
+    """
+
+    def __init__(self, workers=2, level=None, queue=8):
+        self.level = level
+        self.errors = []
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self._slots = threading.BoundedSemaphore(queue)
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def _write(self, surface, path, label):
+        with trace.stage('write', label):
+            if self.level is None:
+                surface.write_to_png(path)
+            else:
+                data = encode_png(surface, self.level)
+                with open(path, 'wb') as png_file:
+                    png_file.write(data)
+        trace.written(path, label)
+
+    def _write_bytes(self, data, path, label):
+        with trace.stage('write', label):
+            with open(path, 'wb') as output_file:
+                output_file.write(data)
+        trace.written(path, label)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            if future.exception() is not None:
+                self.errors.append(future.exception())
+        self._slots.release()
+
+    def _queue(self, function, *args):
+        """Run function on a writer thread, on behalf of the label drawn in this one."""
+        self._slots.acquire()
+        future = self._executor.submit(function, *args, trace.tracer.current)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def submit(self, surface, path):
+        self._queue(self._write, surface, path)
+
+    def submit_bytes(self, data, path):
+        """Write already encoded data, e.g. a panel framebuffer."""
+        self._queue(self._write_bytes, data, path)
+
+    def flush(self):
+        """Wait for every pending write; raise the first error met."""
+        with self._lock:
+            pending = list(self._pending)
+        concurrent.futures.wait(pending)
+        if self.errors:
+            error, self.errors = self.errors[0], []
+            raise error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def save_png(surface, path, writer=None):
+    """Write a surface as PNG, synchronously or through a writer."""
+    if writer is not None:
+        writer.submit(surface, path)
+        return
+    with trace.stage('write'):
+        surface.write_to_png(path)
+    trace.written(path)
+
+
+def save_bytes(data, path, writer=None):
+    """Write encoded output, synchronously or through a writer."""
+    if writer is not None:
+        writer.submit_bytes(data, path)
+        return
+    with trace.stage('write'):
+        with open(path, 'wb') as output_file:
+            output_file.write(data)
+    trace.written(path)
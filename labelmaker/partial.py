@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: partial.py
+%   Description: Dirty-rectangle diffing for e-paper partial refresh
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import numpy as np
+
+# RGB24 pixels leave the top byte undefined
+RGB_MASK = np.uint32(0x00ffffff)
+
+
+def surface_array(surface):
+    """Zero-copy (height, width) uint32 view of a cairo image surface."""
+    surface.flush()
+    height, width = surface.get_height(), surface.get_width()
+    data = np.ndarray((height, surface.get_stride() // 4), dtype=np.uint32,
+                      buffer=surface.get_data())
+    return data[:, :width]
+
+
+def runs(mask, gap=0):
+    """Start/end indices of the True runs of a 1-D mask.
+
+    Runs separated by at most `gap` False entries are merged.
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    return merge(starts, ends, gap)
+
+
+def merge(starts, ends, gap=0):
+    if len(starts) < 2:
+        return starts, ends
+    split = starts[1:] - ends[:-1] > gap
+    return starts[np.concatenate(([True], split))], ends[np.concatenate((split, [True]))]
+
+
+def dirty_rects(previous, current, gap=4, align=8):
+    """Bounding boxes (x, y, w, h) of the pixels that differ between frames.
+
+    Dirty rows are grouped into bands, and the dirty columns of every band
+    into boxes, merging runs closer than `gap` pixels. Box columns are
+    widened to multiples of `align`, the byte boundary of 1bpp panels.
+    """
+    height, width = current.shape
+    if previous is None or previous.shape != current.shape:
+        return [(0, 0, width, height)]
+    changed = ((previous ^ current) & RGB_MASK) != 0
+
+    rects = []
+    for y0, y1 in zip(*runs(changed.any(axis=1), gap)):
+        x0, x1 = runs(changed[y0:y1].any(axis=0), gap)
+        if align > 1:
+            x0 = x0 // align * align
+            x1 = np.minimum(-(-x1 // align) * align, width)
+            x0, x1 = merge(x0, x1)
+        rects += [(int(x), int(y0), int(x_end - x), int(y1 - y0)) for x, x_end in zip(x0, x1)]
+    return rects
+
+
+class FrameTracker(object):
+    """Last frame sent to every device, to send only what changed."""
+
+    def __init__(self, gap=4, align=8):
+        self.gap = gap
+        self.align = align
+        self.frames = {}
+
+    def refresh(self, device, surface):
+        """Regions of a new frame to send to a device.
+
+        Returns a list of (x, y, w, h, pixels) with the pixels as a uint32
+        array copied from the frame; the first frame is sent whole.
+        """
+        current = surface_array(surface) & RGB_MASK
+        rects = dirty_rects(self.frames.get(device), current, self.gap, self.align)
+        self.frames[device] = current
+        return [(x, y, w, h, current[y:y+h, x:x+w].copy()) for x, y, w, h in rects]
+
+    def forget(self, device):
+        self.frames.pop(device, None)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: quality.py
+%   Description: Final or draft render quality shared by the renderers
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import cairo
+
+# scale of draft renders unless told otherwise
+DRAFT_SCALE = 0.25
+
+
+class Quality(object):
+    """How labels are rasterized: final, or as a reduced-scale draft.
+
+    Final renders keep cairo's default antialiasing and image filtering
+    at full size. A draft renders at `draft` times the size with fast
+    antialiasing, unhinted text and nearest-pixel image sampling, for
+    thumbnails and review.
+    """
+
+    def __init__(self, draft=None):
+        self.draft = draft
+
+    def factor(self):
+        return self.draft or 1
+
+    def size(self, width, height):
+        """Pixel size of a width x height label at this quality."""
+        factor = self.factor()
+        return max(1, int(round(width * factor))), max(1, int(round(height * factor)))
+
+    def setup(self, ctx):
+        """Scale a context to label coordinates and set its quality options."""
+        ctx.scale(self.factor(), self.factor())
+        if self.draft:
+            ctx.set_antialias(cairo.ANTIALIAS_FAST)
+            options = cairo.FontOptions()
+            options.set_antialias(cairo.ANTIALIAS_GRAY)
+            options.set_hint_style(cairo.HINT_STYLE_NONE)
+            ctx.set_font_options(options)
+
+    def filter_images(self, ctx):
+        """Sample the image just set as source the fast way, in a draft."""
+        if self.draft:
+            ctx.get_source().set_filter(cairo.FILTER_FAST)
+
+    def suffix(self):
+        """Added to output names, so drafts never replace final renders."""
+        return '_draft' if self.draft else ''
+
+
+current = Quality()
+
+
+def use_draft(draft=None):
+    """Render drafts at this scale from now on (None: final quality)."""
+    current.draft = draft
+
+
+def factor():
+    return current.factor()
+
+
+def size(width, height):
+    return current.size(width, height)
+
+
+def setup(ctx):
+    current.setup(ctx)
+
+
+def filter_images(ctx):
+    current.filter_images(ctx)
+
+
+def suffix():
+    return current.suffix()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: sensorlog.py
+%   Description: Memory-mapped, chunked reader of sensor history logs
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import mmap
+import datetime
+import argparse
+import numpy as np
+
+FIELDS = ('timestamp', 'moisture', 'temperature', 'light', 'humidity', 'battery')
+# one binary log record: seconds since the epoch, then the readings
+RECORD = np.dtype([('timestamp', '<f8')] + [(name, '<f4') for name in FIELDS[1:]])
+# bytes of CSV parsed at a time
+CHUNK = 1 << 20
+
+
+def seconds(value):
+    """Epoch seconds of a CSV timestamp: a number or an ISO 8601 date."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value.strip()).timestamp()
+
+
+class SensorLog(object):
+    """A sensor history log read through a memory map, a chunk at a time.
+
+    CSV logs start with a header naming their columns, in any order;
+    'timestamp' is required, a missing reading column or a 'nan' field
+    means no reading. Any other file is a sequence of little-endian
+    RECORD structs. Iterating yields RECORD arrays of up to `chunk`
+    bytes, so memory does not grow with the log.
+    """
+
+    def __init__(self, path, chunk=CHUNK):
+        self.path = path
+        self.chunk = chunk
+        self.csv = path.lower().endswith('.csv')
+
+    def __iter__(self):
+        if os.path.getsize(self.path) == 0:
+            return
+        if not self.csv:
+            records = np.memmap(self.path, dtype=RECORD, mode='r')
+            step = max(1, self.chunk // RECORD.itemsize)
+            for start in range(0, len(records), step):
+                yield records[start:start + step]
+            return
+        with open(self.path, 'rb') as log_file, \
+                mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = data.find(b'\n') + 1 or len(data)
+            columns = [name.strip() for name in data[:start].decode('utf8').split(',')]
+            if 'timestamp' not in columns:
+                raise ValueError(self.path + ': no timestamp column')
+            used = [(index, name) for index, name in enumerate(columns) if name in FIELDS]
+            while start < len(data):
+                stop = data.find(b'\n', min(start + self.chunk, len(data))) + 1 or len(data)
+                lines = [line for line in data[start:stop].decode('utf8').splitlines()
+                         if line.strip()]
+                start = stop
+                if lines:
+                    yield self._parse(lines, used)
+
+    def _parse(self, lines, used):
+        table = np.loadtxt(lines, delimiter=',', ndmin=2, usecols=[index for index, name in used],
+                           converters={index: seconds for index, name in used
+                                       if name == 'timestamp'})
+        records = np.full(len(table), np.nan, dtype=RECORD)
+        for column, (index, name) in enumerate(used):
+            records[name] = table[:, column]
+        return records
+
+    def readings(self):
+        """(timestamp, values, battery) of every record.
+
+        values maps reading names to numbers, leaving out missing ones;
+        battery is None when missing.
+        """
+        for records in self:
+            for record in records:
+                values = {name: float(record[name]) for name in FIELDS[1:-1]
+                          if not np.isnan(record[name])}
+                battery = None if np.isnan(record['battery']) else float(record['battery'])
+                yield float(record['timestamp']), values, battery
+
+
+def write_binary(log, path):
+    """Copy a log into the binary record format; returns the record count."""
+    count = 0
+    with open(path, 'wb') as binary_file:
+        for records in log:
+            binary_file.write(np.ascontiguousarray(records, dtype=RECORD).tobytes())
+            count += len(records)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a CSV sensor log to binary records.')
+    parser.add_argument('csv', help='CSV log with a header line')
+    parser.add_argument('output', help='binary log to write')
+    args = parser.parse_args()
+
+    print('%d records written to %s' % (write_binary(SensorLog(args.csv), args.output),
+                                         args.output))
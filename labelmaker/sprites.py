@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: sprites.py
+%   Description: Sprite atlas of pre-rendered label elements
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import math
+import cairo
+
+from labelmaker import quality
+
+
+class SpriteAtlas(object):
+    """Pre-rendered sprites shelf-packed on shared ARGB32 atlas pages.
+
+    A sprite is keyed by everything its drawing depends on except its
+    position, so the same element drawn anywhere on any label is rendered
+    once and blitted afterwards. The sub-pixel phase of the position is
+    part of the key, so a blit matches drawing in place.
+    """
+
+    def __init__(self, page_size=1024):
+        self.page_size = page_size
+        self.pages = []
+        self.sprites = {}
+        self.hits = 0
+        self.misses = 0
+        self._x = self._y = self._shelf = 0
+
+    def _allocate(self, w, h):
+        size = max(self.page_size, w, h)
+        if self.pages and self._x + w > self.pages[-1].get_width():
+            self._x, self._y, self._shelf = 0, self._y + self._shelf, 0
+        if not self.pages or self._y + h > self.pages[-1].get_height():
+            self.pages.append(cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size))
+            self._x = self._y = self._shelf = 0
+        x, y = self._x, self._y
+        self._x += w
+        self._shelf = max(self._shelf, h)
+        return self.pages[-1], x, y
+
+    def draw(self, ctx, key, left, top, width, height, render):
+        """Paint render(ctx) for the box at (left, top) through a cached sprite.
+
+        render draws at the box's own label coordinates; it is only called
+        the first time a key is seen.
+        """
+        x, y = int(math.floor(left)), int(math.floor(top))
+        w, h = int(math.ceil(left + width)) - x, int(math.ceil(top + height)) - y
+        key = key + (left - x, top - y, w, h)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            self.misses += 1
+            page, sx, sy = sprite = self._allocate(w, h)
+            page_ctx = cairo.Context(page)
+            page_ctx.rectangle(sx, sy, w, h)
+            page_ctx.clip()
+            page_ctx.translate(sx - x, sy - y)
+            render(page_ctx)
+            page.flush()
+            self.sprites[key] = sprite
+        else:
+            self.hits += 1
+            page, sx, sy = sprite
+
+        ctx.save()
+        ctx.set_source_surface(page, x - sx, y - sy)
+        quality.filter_images(ctx)
+        ctx.rectangle(x, y, w, h)
+        ctx.fill()
+        ctx.restore()
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'sprites': len(self.sprites),
+                'pages': len(self.pages)}
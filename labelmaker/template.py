@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: template.py
+%   Description: Validated, compiled plant label templates
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import math
+import json
+import numbers
+
+GAUGE_ANGLE = 270
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class Model(object):
+    """Immutable record whose fields are its __slots__."""
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(type(self).__name__ + ' is immutable')
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join('%s=%r' % (name, getattr(self, name)) for name in self.__slots__))
+
+
+class Text(Model):
+    __slots__ = ('value', 'font_type', 'font_size', 'left', 'top')
+
+
+class Picture(Model):
+    __slots__ = ('path', 'left', 'top', 'height', 'width', 'display')
+
+
+class LifeCycle(Model):
+    __slots__ = ('display', 'icon', 'span')
+
+
+class Gauge(Model):
+    """A parameter gauge with its arc angles already worked out.
+
+    The gauge spans `alpha` radians and leaves a `beta` gap at the bottom;
+    min_beta/max_beta bound the recommended range and mid_beta points at
+    its middle, all measured from the start of the arc.
+    """
+    __slots__ = ('name', 'icon', 'unit', 'recommended', 'font_type', 'font_size', 'font_xoff',
+                 'left', 'top', 'radius', 'rel_range', 'abs_range',
+                 'angle', 'alpha', 'beta', 'min_beta', 'max_beta', 'mid_beta')
+
+    def beta_of(self, value):
+        """Arc angle of a reading."""
+        return (value - self.abs_range[0]) / abs(self.abs_range[1] - self.abs_range[0]) * self.alpha
+
+
+class Template(Model):
+    """A compiled template; source is its config as canonical JSON, for hashing."""
+    __slots__ = ('path', 'source', 'width', 'height', 'background', 'radius',
+                 'title', 'subtitle', 'image', 'bubble', 'life_cycle', 'synchronized',
+                 'parameters')
+
+    def gauge(self, name):
+        for gauge in self.parameters:
+            if gauge.name == name:
+                return gauge
+        raise TemplateError(str(self.path) + ': no parameter ' + name)
+
+
+def canonical(config):
+    """A config as sorted, compact JSON: an immutable stand-in for its dict."""
+    return json.dumps(config, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def get(section, name, where):
+    if not isinstance(section, dict) or name not in section:
+        raise TemplateError(where + ': missing ' + name)
+    return section[name]
+
+
+def number(section, name, where):
+    value = get(section, name, where)
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        raise TemplateError('%s.%s: expected a number, got %r' % (where, name, value))
+    return value
+
+
+def numbers_of(section, name, where, count):
+    value = get(section, name, where)
+    if (not isinstance(value, (list, tuple)) or len(value) != count
+            or any(isinstance(v, bool) or not isinstance(v, numbers.Real) for v in value)):
+        raise TemplateError('%s.%s: expected %d numbers, got %r' % (where, name, count, value))
+    return tuple(value)
+
+
+def string(section, name, where):
+    value = get(section, name, where)
+    if not isinstance(value, str):
+        raise TemplateError('%s.%s: expected a string, got %r' % (where, name, value))
+    return value
+
+
+def flag(section, name, where):
+    value = get(section, name, where)
+    if not isinstance(value, bool):
+        raise TemplateError('%s.%s: expected true or false, got %r' % (where, name, value))
+    return value
+
+
+def asset(section, name, where, base_dir, required=True):
+    path = os.path.abspath(os.path.join(base_dir, string(section, name, where)))
+    if required and not os.path.isfile(path):
+        raise TemplateError('%s.%s: no such file %s' % (where, name, path))
+    return path
+
+
+def compile_text(config, name):
+    section = get(config, name, 'template')
+    left, top = numbers_of(section, 'position', name, 2)
+    return Text(value=string(section, 'value', name),
+                font_type=string(section, 'font_type', name),
+                font_size=number(section, 'font_size', name),
+                left=left, top=top)
+
+
+def compile_picture(config, name, base_dir):
+    section = get(config, name, 'template')
+    left, top = numbers_of(section, 'position', name, 2)
+    height, width = numbers_of(section, 'size', name, 2)
+    return Picture(path=asset(section, 'path', name, base_dir),
+                   left=left, top=top, height=height, width=width, display=True)
+
+
+def compile_gauge(name, section, base_dir, angle=GAUGE_ANGLE):
+    where = 'parameters.' + name
+    rel_range = numbers_of(section, 'rel_range', where, 2)
+    abs_range = numbers_of(section, 'abs_range', where, 2)
+    if abs_range[0] == abs_range[1]:
+        raise TemplateError(where + ': empty abs_range')
+    if rel_range[0] < abs_range[0] or rel_range[1] > abs_range[1]:
+        raise TemplateError(where + ': rel_range values are not in abs_range')
+    span = abs(abs_range[1] - abs_range[0])
+    alpha = math.radians(angle)
+    left, top = numbers_of(section, 'position', where, 2)
+    recommended = section.get('recomended')
+    return Gauge(name=name,
+                 icon=asset(section, 'icon', where, base_dir),
+                 unit=string(section, 'unit', where),
+                 recommended=None if recommended is None else str(recommended),
+                 font_type=string(section, 'font_type', where),
+                 font_size=number(section, 'font_size', where),
+                 font_xoff=number(section, 'font_xoff', where),
+                 left=left, top=top,
+                 radius=number(section, 'radius', where),
+                 rel_range=rel_range, abs_range=abs_range,
+                 angle=angle, alpha=alpha, beta=2*math.pi - alpha,
+                 min_beta=(rel_range[0] - abs_range[0]) / span * alpha,
+                 max_beta=(1 - (abs_range[1] - rel_range[1]) / span) * alpha,
+                 mid_beta=((rel_range[0] + rel_range[1]) / 2 - abs_range[0]) / span * alpha)
+
+
+def compile_template(config, path=None, base_dir='.', gauges=()):
+    """Validate a template dict and compile it into an immutable Template.
+
+    Asset paths are resolved against base_dir (the directory the renderers
+    run from) and must exist. gauges names the parameters the renderer
+    draws: only those are required and compiled, other parameters are
+    left unchecked. Without gauges every parameter is compiled. Raises
+    TemplateError naming the first problem found.
+    """
+    general = get(config, 'general', 'template')
+    width, height = numbers_of(general, 'size', 'general', 2)
+    life_cycle = get(config, 'life-cycle', 'template')
+    display = flag(life_cycle, 'display', 'life-cycle')
+    synchronized = get(config, 'synchronized', 'template')
+    sync_display = flag(synchronized, 'display', 'synchronized')
+    top, left, sync_height, sync_width = numbers_of(synchronized, 'position', 'synchronized', 4)
+    parameters = get(config, 'parameters', 'template')
+    if not isinstance(parameters, dict):
+        raise TemplateError('parameters: expected a mapping')
+    for name in gauges:
+        get(parameters, name, 'parameters')
+
+    return Template(path=path,
+                    source=canonical(config),
+                    width=width,
+                    height=height,
+                    background=numbers_of(general, 'background', 'general', 3),
+                    radius=number(general, 'radius', 'general'),
+                    title=compile_text(config, 'title'),
+                    subtitle=compile_text(config, 'subtitle'),
+                    image=compile_picture(config, 'image', base_dir),
+                    bubble=compile_picture(config, 'bubble', base_dir),
+                    life_cycle=LifeCycle(display=display,
+                                         icon=asset(life_cycle, 'icon', 'life-cycle', base_dir, display),
+                                         span=string(life_cycle, 'span', 'life-cycle')),
+                    synchronized=Picture(path=asset(synchronized, 'icon', 'synchronized', base_dir,
+                                                    sync_display),
+                                         left=left, top=top, height=sync_height, width=sync_width,
+                                         display=sync_display),
+                    parameters=tuple(compile_gauge(name, section, base_dir)
+                                     for name, section in parameters.items()
+                                     if not gauges or name in gauges))
+
+
+def load(path, base_dir='.', gauges=()):
+    """Read a JSON (or YAML) template file and compile it."""
+    with open(path, 'rt', encoding='utf8') as template_file:
+        if path.lower().endswith(('.yaml', '.yml')):
+            import yaml
+            config = yaml.load(template_file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        else:
+            config = json.load(template_file)
+    try:
+        return compile_template(config, path, base_dir, gauges)
+    except TemplateError as e:
+        raise TemplateError(path + ': ' + str(e))
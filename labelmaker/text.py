@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: text.py
+%   Description: Cached text measurement and fit-to-box sizing
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import collections
+import cairo
+
+from labelmaker import trace
+
+NORMAL = cairo.FONT_SLANT_NORMAL
+ITALIC = cairo.FONT_SLANT_ITALIC
+
+
+class TextMetrics(object):
+    """Bounded LRU of text extents keyed by (face, slant, size, string).
+
+    Measurements are taken on a private scratch context, so they do not
+    depend on (or disturb) the font state of the context being drawn on.
+    """
+
+    def __init__(self, size=4096):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._extents = collections.OrderedDict()
+        self._fits = collections.OrderedDict()
+        self._ctx = cairo.Context(cairo.ImageSurface(cairo.FORMAT_RGB24, 1, 1))
+
+    def _put(self, store, key, value):
+        store[key] = value
+        while len(store) > self.size:
+            store.popitem(last=False)
+
+    def extents(self, face, size, string, slant=NORMAL):
+        key = face, slant, size, string
+        extents = self._extents.get(key)
+        if extents is None:
+            self.misses += 1
+            self._ctx.select_font_face(face, slant, cairo.FONT_WEIGHT_NORMAL)
+            self._ctx.set_font_size(size)
+            extents = self._ctx.text_extents(string)
+            self._put(self._extents, key, extents)
+        else:
+            self.hits += 1
+            self._extents.move_to_end(key)
+        return extents
+
+    def fit(self, face, string, width, max_size, min_size=1, slant=NORMAL, tolerance=0.25):
+        """Largest font size up to max_size at which string is at most width wide.
+
+        Text width grows almost linearly with the size, so the search starts
+        from the linear estimate and bisects the rest; it takes a handful
+        of measurements at most and never returns a size that overflows,
+        unless even min_size does.
+        """
+        key = face, slant, string, width, max_size, min_size
+        size = self._fits.get(key)
+        if size is not None:
+            return size
+        full = self.extents(face, max_size, string, slant).width
+        if full <= width:
+            size = max_size
+        else:
+            low, high = min_size, max_size
+            guess = max_size * width / full
+            if low < guess < high:
+                if self.extents(face, guess, string, slant).width <= width:
+                    low = guess
+                else:
+                    high = guess
+            while high - low > tolerance:
+                middle = (low + high) / 2
+                if self.extents(face, middle, string, slant).width <= width:
+                    low = middle
+                else:
+                    high = middle
+            size = low
+        self._put(self._fits, key, size)
+        return size
+
+
+metrics = TextMetrics()
+
+
+@trace.timed('text')
+def extents(face, size, string, slant=NORMAL):
+    return metrics.extents(face, size, string, slant)
+
+
+@trace.timed('text')
+def fit(face, string, width, max_size, min_size=1, slant=NORMAL):
+    return metrics.fit(face, string, width, max_size, min_size, slant)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: trace.py
+%   Description: Opt-in per-stage timing of the render pipeline
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import json
+import time
+import threading
+import functools
+import collections
+import numpy as np
+
+from labelmaker import assets
+
+
+class NullStage(object):
+    """Stage used while tracing is disabled: costs one call and nothing else."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage(object):
+    """Stage of the label being drawn in this thread, or of the label given."""
+
+    def __init__(self, tracer, name, label=None):
+        self.tracer = tracer
+        self.name = name
+        self.label = label
+
+    def __enter__(self):
+        if self.label is None:
+            self.label = self.tracer.current
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.label, self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class Label(Stage):
+    """Stage spanning a whole label, which also snapshots its cache counters.
+
+    Its bytes written are counted apart, as writer threads may still be
+    writing the label after it is drawn.
+    """
+
+    def __enter__(self):
+        self.previous = self.tracer.current
+        self.tracer.current = self.name
+        self.cache = assets.cache.hits, assets.cache.misses
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        tracer = self.tracer
+        seconds = time.perf_counter() - self.start
+        tracer.record(self.name, 'label', self.start, seconds)
+        with tracer._lock:
+            tracer.labels.append({'label': self.name,
+                                  'ms': seconds * 1000,
+                                  'asset_hits': assets.cache.hits - self.cache[0],
+                                  'asset_misses': assets.cache.misses - self.cache[1]})
+        tracer.current = self.previous
+        return False
+
+
+class Tracer(object):
+    """Stage timers, counters and a per-label trace of the render pipeline.
+
+    Disabled by default; stage() and label() then return a shared no-op
+    context manager, so the instrumented code pays next to nothing. The
+    label being drawn is kept per thread; writer threads pass the label
+    of the job they run instead.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.clear()
+
+    @property
+    def current(self):
+        return getattr(self._local, 'label', None)
+
+    @current.setter
+    def current(self, label):
+        self._local.label = label
+
+    def clear(self):
+        with self._lock:
+            self.current = None
+            self.events = []
+            self.labels = []
+            self.counters = collections.Counter()
+            self.label_bytes = collections.Counter()
+
+    def record(self, label, name, start, seconds):
+        with self._lock:
+            self.events.append((label, name, start, seconds, os.getpid()))
+
+    def stage(self, name, label=None):
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, label)
+
+    def label(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return Label(self, name)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += value
+
+    def wrote(self, size, label=None):
+        """Count an output of size bytes, written for label (default: the current one)."""
+        if self.enabled:
+            if label is None:
+                label = self.current
+            with self._lock:
+                self.counters['files_written'] += 1
+                self.counters['bytes_written'] += size
+                self.label_bytes[label] += size
+
+    def written(self, path, label=None):
+        if self.enabled:
+            self.wrote(os.path.getsize(path), label)
+
+    def drain(self):
+        """Hand over what was recorded so far, e.g. from a worker process."""
+        with self._lock:
+            records = self.events, self.labels, dict(self.counters), dict(self.label_bytes)
+        self.clear()
+        return records
+
+    def absorb(self, records):
+        events, labels, counters, label_bytes = records
+        with self._lock:
+            self.events += events
+            self.labels += labels
+            self.counters.update(counters)
+            self.label_bytes.update(label_bytes)
+
+    def aggregate(self):
+        stages = collections.defaultdict(list)
+        for label, name, start, seconds, pid in self.events:
+            stages[name].append(seconds * 1000)
+        summary = {}
+        for name, times in stages.items():
+            times = np.array(times)
+            summary[name] = {'count': len(times),
+                             'total_ms': float(times.sum()),
+                             'mean_ms': float(times.mean()),
+                             'p50_ms': float(np.percentile(times, 50)),
+                             'p99_ms': float(np.percentile(times, 99))}
+        return summary
+
+    def to_json(self):
+        counters = dict(self.counters)
+        counters['asset_hits'] = sum(label['asset_hits'] for label in self.labels)
+        counters['asset_misses'] = sum(label['asset_misses'] for label in self.labels)
+        labels = [dict(label, bytes_written=self.label_bytes.get(label['label'], 0))
+                  for label in self.labels]
+        return {'stages': self.aggregate(), 'counters': counters, 'labels': labels}
+
+    def to_chrome_trace(self):
+        """Events in the Chrome trace format (chrome://tracing, Perfetto)."""
+        return {'traceEvents': [{'name': name, 'cat': str(label), 'ph': 'X', 'pid': pid, 'tid': pid,
+                                 'ts': start * 1e6, 'dur': seconds * 1e6}
+                                for label, name, start, seconds, pid in self.events],
+                'otherData': self.to_json()['counters']}
+
+    def save(self, path):
+        """Write the trace; a .trace or .chrome.json name selects Chrome format."""
+        chrome = path.endswith('.trace') or path.endswith('.chrome.json')
+        with open(path, 'w') as trace_file:
+            json.dump(self.to_chrome_trace() if chrome else self.to_json(), trace_file, indent=1)
+
+
+tracer = Tracer()
+
+
+def enable(enabled=True):
+    tracer.enabled = enabled
+
+
+def stage(name, label=None):
+    return tracer.stage(name, label)
+
+
+def label(name):
+    return tracer.label(name)
+
+
+def timed(name):
+    """Decorator recording every call of a function as a stage."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with Stage(tracer, name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    tracer.count(name, value)
+
+
+def wrote(size, label=None):
+    tracer.wrote(size, label)
+
+
+def written(path, label=None):
+    tracer.written(path, label)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: variants.py
+%   Description: Content-addressed store of pre-scaled image variants
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import json
+import fnmatch
+import hashlib
+import argparse
+import numpy as np
+
+from labelmaker import assets, template
+from labelmaker.catalogue import Catalogue
+from labelmaker.partial import surface_array
+
+
+class VariantStore(object):
+    """Directory of source images pre-scaled to the sizes labels draw them at.
+
+    Variants are named after the SHA-256 of the source file's content and
+    the target size, so a renamed or copied photo reuses them and an
+    edited one gets new ones. With a threshold (0-1) variants are also
+    reduced to black and white, as the 1bpp e-paper panel shows them.
+    Index entries hashed since the last drain() are kept apart, so worker
+    processes can hand theirs back to the one that saves the index.
+    """
+
+    def __init__(self, directory='.label_variants', threshold=None):
+        self.directory = directory
+        self.threshold = threshold
+        self.index_path = os.path.join(directory, 'index.json')
+        try:
+            with open(self.index_path) as index_file:
+                self.index = json.load(index_file)
+        except (OSError, ValueError):
+            self.index = {}
+        self.added = {}
+
+    def digest(self, path):
+        """Content hash of a source file, remembered while its mtime holds."""
+        path, mtime = assets.AssetCache.key(path)
+        entry = self.index.get(path)
+        if entry is None or entry[0] != mtime:
+            sha = hashlib.sha256()
+            with open(path, 'rb') as source_file:
+                for block in iter(lambda: source_file.read(1 << 16), b''):
+                    sha.update(block)
+            entry = self.index[path] = self.added[path] = [mtime, sha.hexdigest()]
+        return entry[1]
+
+    def drain(self):
+        """Index entries hashed since the last drain."""
+        added, self.added = self.added, {}
+        return added
+
+    def absorb(self, entries):
+        self.index.update(entries)
+
+    def path(self, source, width, height):
+        digest = self.digest(source)
+        name = '%s_%dx%d' % (digest, width, height)
+        if self.threshold is not None:
+            name += '_t%d' % round(self.threshold * 100)
+        return os.path.join(self.directory, digest[:2], name + '.png')
+
+    def lookup(self, source, width, height):
+        path = self.path(source, width, height)
+        return path if os.path.isfile(path) else None
+
+    def store(self, surface, source, width, height):
+        path = self.path(source, width, height)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + '.' + str(os.getpid()) + '.tmp'
+        surface.write_to_png(temporary)
+        os.replace(temporary, path)
+        return path
+
+    def binarize(self, surface):
+        """Threshold an ARGB32 surface in place to opaque black or white, keeping alpha."""
+        pixels = surface_array(surface)
+        alpha = (pixels >> 24) & 0xff
+        safe = np.maximum(alpha, 1).astype(np.float32)
+        gray = (0.299*((pixels >> 16) & 0xff) + 0.587*((pixels >> 8) & 0xff)
+                + 0.114*(pixels & 0xff)) / safe
+        white = (gray >= self.threshold) & (alpha > 0)
+        pixels[...] = (alpha << 24) | np.where(white, alpha * 0x010101, 0).astype(np.uint32)
+        surface.mark_dirty()
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = self.index_path + '.' + str(os.getpid()) + '.tmp'
+        with open(temporary, 'w') as index_file:
+            json.dump(self.index, index_file, indent=1, sort_keys=True)
+        os.replace(temporary, self.index_path)
+
+
+def template_boxes(model):
+    """(path, width, height) boxes a plant template draws its images in."""
+    boxes = [(model.image.path, model.image.width, model.image.height),
+             (model.bubble.path, model.bubble.width, model.bubble.height)]
+    if model.synchronized.display:
+        boxes.append((model.synchronized.path, model.synchronized.width,
+                      model.synchronized.height))
+    boxes += [(gauge.icon, gauge.radius, gauge.radius) for gauge in model.parameters]
+    return boxes
+
+
+def catalogue_boxes(catalogue):
+    box = catalogue.layout.image
+    for section, spice in catalogue:
+        yield spice.img, box.width, box.height
+
+
+def preprocess(boxes):
+    """Make sure a variant exists for every box; returns how many were made.
+
+    Boxes are fitted the way draw_image does: the image keeps its aspect
+    and fills the box's width or height.
+    """
+    made = 0
+    for path, width, height in boxes:
+        img_width, img_height = assets.dimensions(path)
+        scale_xy = min(width / img_width, height / img_height)
+        target = max(1, int(round(img_width*scale_xy))), max(1, int(round(img_height*scale_xy)))
+        if assets.cache.variants.lookup(path, *target) is None:
+            assets.load_scaled(path, *target)
+            made += 1
+    return made
+
+
+def sources(paths):
+    """Template files among paths; directories are searched for *.json."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for file in sorted(fnmatch.filter(files, '*.json')):
+                    yield os.path.join(root, file)
+        else:
+            yield path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Pre-scale the images of plant templates and spice catalogues.')
+    parser.add_argument('paths', nargs='+',
+                        help='plant template JSON files or directories, spice catalogue YAML files')
+    parser.add_argument('--dir', default='.label_variants', help='variant store directory')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='also reduce variants to black and white at this gray level (0-1)')
+    args = parser.parse_args()
+
+    store = VariantStore(args.dir, args.threshold)
+    assets.use_variants(store)
+    made = 0
+    for path in sources(args.paths):
+        if path.lower().endswith(('.yaml', '.yml')):
+            made += preprocess(catalogue_boxes(Catalogue(path)))
+        else:
+            made += preprocess(template_boxes(template.load(path)))
+    store.save()
+    print('%d variants made in %s' % (made, args.dir))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: vector.py
+%   Description: PDF/SVG output surfaces
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import cairo
+
+BACKENDS = ('png', 'pdf', 'svg')
+
+
+def document(backend, output, width, height, dpi=72):
+    """Open a PDF or SVG surface for a page of width x height pixels.
+
+    Returns the surface and a context scaled so drawing keeps using pixel
+    coordinates at the given dpi. A PDF takes one page per show_page();
+    an SVG holds a single page.
+    """
+    points = 72 / dpi
+    if backend == 'pdf':
+        surface = cairo.PDFSurface(output, width*points, height*points)
+    elif backend == 'svg':
+        surface = cairo.SVGSurface(output, width*points, height*points)
+    else:
+        raise ValueError('Unknown vector backend: ' + str(backend))
+    ctx = cairo.Context(surface)
+    ctx.scale(points, points)
+    return surface, ctx
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+------------------------------------------------------------
+%   File: watch.py
+%   Description: File watching and template to asset dependency graph
+%   Author: J.G.Aguado
+%   Email: jon-garcia@hotmail.com
+%   Date of creation: 10/18/2026
+------------------------------------------------------------
+"""
+import os
+import time
+import errno
+import fnmatch
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# inotify event masks
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+EVENTS = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT = struct.Struct('iIII')
+
+
+class DependencyGraph(object):
+    """Which targets (labels, pages) are drawn from which files, both ways."""
+
+    def __init__(self):
+        self.files_of = {}
+        self.targets_of = {}
+
+    def set(self, target, files):
+        """Replace the files a target depends on."""
+        self.remove(target)
+        files = {os.path.abspath(path) for path in files}
+        self.files_of[target] = files
+        for path in files:
+            self.targets_of.setdefault(path, set()).add(target)
+
+    def remove(self, target):
+        for path in self.files_of.pop(target, ()):
+            targets = self.targets_of[path]
+            targets.discard(target)
+            if not targets:
+                del self.targets_of[path]
+
+    def affected(self, paths):
+        """Targets depending on any of paths."""
+        targets = set()
+        for path in paths:
+            targets |= self.targets_of.get(os.path.abspath(path), set())
+        return targets
+
+    def files(self):
+        return list(self.targets_of)
+
+
+def walk(root):
+    """root and every directory under it."""
+    for path, dirs, files in os.walk(root):
+        yield path, files
+
+
+class PollingWatcher(object):
+    """Finds changed files by comparing their stat every `interval` seconds.
+
+    Tracked files are seen, and new files matching the pattern of a tree
+    given to track_tree(), which is listed again on every poll.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.stats = {}
+        self.trees = []
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _found(self):
+        return {os.path.join(path, file) for root, pattern in self.trees
+                for path, files in walk(root) for file in fnmatch.filter(files, pattern)}
+
+    def track(self, files):
+        files = {os.path.abspath(path) for path in files} | self._found()
+        self.stats = {path: self.stats[path] if path in self.stats else self._stat(path)
+                      for path in files}
+
+    def track_tree(self, root, pattern='*'):
+        """Also report files matching pattern created anywhere under root."""
+        self.trees.append((os.path.abspath(root), pattern))
+        self.track(self.stats)
+
+    def poll(self, timeout=None):
+        """Changed tracked files, waiting up to timeout seconds (None: until one changes)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, stat in self.stats.items():
+                current = self._stat(path)
+                if current != stat:
+                    self.stats[path] = current
+                    changed.add(path)
+            if self.trees:
+                for path in self._found() - set(self.stats):
+                    self.stats[path] = self._stat(path)
+                    changed.add(path)
+            if changed:
+                return changed
+            remaining = self.interval if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Linux inotify on the directories of the tracked files, through libc.
+
+    Every change in a watched directory is reported, new files included.
+    Under a tree given to track_tree() every directory is watched, and
+    so are the ones created later, whose files are reported as new.
+    """
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.directories = {}
+        self.trees = []
+
+    def _add(self, directory):
+        if directory in self.directories.values() or not os.path.isdir(directory):
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), EVENTS)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), directory)
+        self.directories[wd] = directory
+
+    def track(self, files):
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in files}:
+            self._add(directory)
+
+    def track_tree(self, root, pattern='*'):
+        """Watch every directory under root, now and as they are created.
+
+        Changes are reported whatever their name; pattern is for the
+        polling watcher, which has to list the tree for new files.
+        """
+        root = os.path.abspath(root)
+        self.trees.append(root)
+        for path, files in walk(root):
+            self._add(path)
+
+    def _created(self, directory):
+        """Watch a new directory of a tree; its files so far are reported."""
+        if not any(os.path.commonpath([directory, root]) == root for root in self.trees):
+            return set()
+        created = set()
+        for path, files in walk(directory):
+            self._add(path)
+            created |= {os.path.join(path, file) for file in files}
+        return created
+
+    def _read(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return changed
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+                name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b'\0')
+                offset += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost: report everything watched
+                    changed |= {os.path.join(directory, entry)
+                                for directory in self.directories.values()
+                                for entry in os.listdir(directory)}
+                elif mask & IN_IGNORED:
+                    # the directory is gone; it is watched again if it comes back
+                    self.directories.pop(wd, None)
+                elif wd in self.directories and name:
+                    path = os.path.join(self.directories[wd], os.fsdecode(name))
+                    changed.add(path)
+                    if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        changed |= self._created(path)
+
+    def poll(self, timeout=None):
+        """Changed files, waiting up to timeout seconds (None: until one changes)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            changed = self._read() if ready else set()
+            if changed or not ready and deadline is not None:
+                return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def watcher(interval=0.5):
+    """An inotify watcher where the system has one, else a polling one."""
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError):
+        return PollingWatcher(interval)
+
+
+def changes(observer, debounce=0.2):
+    """Wait for changed files, then until none has changed for debounce seconds."""
+    changed = observer.poll()
+    while True:
+        more = observer.poll(debounce)
+        if not more:
+            return changed
+        changed |= more